@@ -2,22 +2,20 @@ import streamlit as st
 
 st.set_page_config(layout="wide")
 
-import pandas as pd
-from utils.data_loader import load_data as raw_load_data, merge_dimensions
-
-@st.cache_data
-def load_data():
-    return raw_load_data()
-
-from pages import (
-    revenue_trend,
-    monthly_breakdown,
-    food_nonholiday,
-    product_threshold,
-    cumulative_sales,
-    cashflow_ratio,
-    sales_inventory_page,
-)
+from utils.analytics import filter_spec
+from utils.filters import sidebar_filters
+from utils.profiling import profile_stage
+from utils.refresh import DataRefresher
+from utils.result_cache import compute_ahead
+from utils.instrumentation import perf_panel, version_stamp
+from pages import PAGES, load_page
+from config import PAGE_WORKERS, SHOW_PERF_PANEL
+
+# One per process, shared by every session: it holds the current version of the data and
+# swaps in the next one, built in the background, when the files under data/ change
+@st.cache_resource
+def data_refresher():
+    return DataRefresher()
 
 # st.set_page_config(layout="wide")
 st.markdown("<h1 style='text-align: center;'>🧠 ThoughtSpot Data Challenge Dashboard</h1>", unsafe_allow_html=True)
@@ -25,80 +23,43 @@ st.markdown("<h1 style='text-align: center;'>🧠 ThoughtSpot Data Challenge Das
 # -------------------------
 # Load & Prepare Data
 # -------------------------
-f_sales, f_inventory, d_products, d_date = load_data()
-sales_df, inventory_df = merge_dimensions(f_sales, f_inventory, d_products, d_date)
+# This run reads one version throughout, even if a newer one is swapped in meanwhile.
+# Only the dimensions and the product search index are needed for the sidebar; on the
+# first run the facts are loaded and rolled up once it is on screen.
+refresher = data_refresher()
+bundle = refresher.snapshot()
+_, d_date = bundle["dimensions"]
 
 # -------------------------
 # Sidebar Filters
 # -------------------------
-st.sidebar.header("Filter Data")
-
-# Product type
-product_types = sorted(d_products["type"].dropna().unique().tolist())
-type_options = ["Overall"] + product_types
-selected_type = st.sidebar.selectbox("Select Product Type", type_options)
-
-# Full product list for selected type
-if selected_type == "Overall":
-    all_products_in_type = sorted(d_products["product_name"].dropna().unique().tolist())
-else:
-    all_products_in_type = sorted(
-        d_products[d_products["type"] == selected_type]["product_name"].dropna().unique().tolist()
-    )
-
-# Search + Select All Toggle
-search_term = st.sidebar.text_input("🔎 Search Product")
-select_all = st.sidebar.checkbox("Select All Products", value=True)
-
-if search_term:
-    filtered_products = [p for p in all_products_in_type if search_term.lower() in p.lower()]
-    default_selected = filtered_products
-else:
-    filtered_products = all_products_in_type
-    default_selected = all_products_in_type if select_all else []
-
-selected_products = st.sidebar.multiselect(
-    "Select Product(s)",
-    options=filtered_products,
-    default=default_selected,
-    key="product_select"
-)
-
-st.sidebar.caption(f"Selected {len(selected_products)} of {len(filtered_products)} shown | {len(all_products_in_type)} total in type")
-
-# Date Range
-min_date = sales_df["date"].min()
-max_date = sales_df["date"].max()
-selected_dates = st.sidebar.date_input("Select Date Range", [min_date, max_date])
-start_date, end_date = pd.to_datetime(selected_dates[0]), pd.to_datetime(selected_dates[1])
+with profile_stage("sidebar"):
+    selected_products, start_date, end_date = sidebar_filters(bundle["product_index"], d_date)
+    version_stamp(refresher, bundle)
 
 # -------------------------
 # Filtered Data for Pages
 # -------------------------
-sales_df["sales_revenue"] = sales_df["quantity_sold"] * sales_df["unit_retail_price_usd"]
-inventory_df["inventory_cost"] = inventory_df["quantity_purchased"] * inventory_df["unit_cost_usd"]
-
-sales_filtered = sales_df[
-    (sales_df["product_name"].isin(selected_products)) &
-    (sales_df["date"].between(start_date, end_date))
-].copy()
-
-inventory_filtered = inventory_df[
-    (inventory_df["product_name"].isin(selected_products)) &
-    (inventory_df["date"].between(start_date, end_date))
-].copy()
-
-
-import pages.sales_inventory_page as test
-print("DEBUG:", dir(test))
+# Pages resolve this spec against the dataset; the cube lookup is shared between them
+spec = filter_spec(selected_products, start_date, end_date)
 
 # -------------------------
 # Render Pages
 # -------------------------
-sales_inventory_page.show(sales_filtered, inventory_filtered)
-revenue_trend.show(sales_filtered, inventory_filtered)
-monthly_breakdown.show(sales_filtered, inventory_filtered)
-food_nonholiday.show(sales_df)
-product_threshold.show(sales_df, selected_products, start_date, end_date)
-cumulative_sales.show(sales_df, selected_products, start_date, end_date)
-cashflow_ratio.show(sales_df, inventory_df, selected_products, start_date, end_date)
\ No newline at end of file
+with st.spinner("Loading data..."):
+    data = refresher.dataset(bundle)
+
+# With more than one PAGE_WORKERS, every page's computations run side by side first and
+# the pages then render in order on this thread, reading their results from the cache;
+# that needs every page module up front. Otherwise each page's module is imported only
+# as its section renders.
+page_args = {name: (data, spec) if filtered else (data,) for name, filtered in PAGES.items()}
+if PAGE_WORKERS > 1:
+    with profile_stage("compute ahead"):
+        compute_ahead([job for name in PAGES for job in load_page(name).jobs(*page_args[name])])
+
+for name in PAGES:
+    load_page(name).show(*page_args[name])
+
+if SHOW_PERF_PANEL:
+    perf_panel()
\ No newline at end of file
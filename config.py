@@ -0,0 +1,98 @@
+# -------------------------
+# Data Paths
+# -------------------------
+DATA_DIR = "data"
+SOURCE_WORKBOOK = "data/CaseStudy_Role_SA.xlsx"
+
+# Columnar copies of the CSVs, rebuilt whenever a source file changes
+CACHE_DIR = "data/.cache"
+
+# How often the app checks the files under data/ for a new version, which it then loads
+# in the background while sessions keep reading the current one
+DATA_POLL_SECONDS = 5
+
+# When the only change is new fact segments, the app adds them into the current dataset
+# rather than loading everything again. This also does the full load and compares the
+# two, logging an error and serving the full load when they differ.
+VERIFY_APPENDS = False
+
+# Appended rows are kept apart from the rest of the rollup cube, and from the hashes the
+# duplicate check looks rows up in, until they reach this share of it; then they are
+# folded in. Smaller shares keep reads quicker, larger ones make folding rarer.
+APPEND_COMPACT_SHARE = 0.05
+
+# -------------------------
+# Fact Cleaning
+# -------------------------
+# What load_data does with exact duplicate fact rows: "first" keeps one copy, "sum" folds
+# the copies into one row with their quantities added, "reject" raises
+FACT_DUPLICATE_POLICY = "first"
+
+# -------------------------
+# Ingestion
+# -------------------------
+# Memory for the rows the streaming workbook load (python -m utils.setup_data --stream)
+# holds at once; sets how many rows are read, and compared with the stored months, per
+# chunk. The interpreter and the open workbook come on top, as do the hashes of the
+# stored rows of the month being compared (about 16 bytes a row).
+INGEST_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# -------------------------
+# Calendar
+# -------------------------
+# First month of the fiscal year; fiscal years are named after the calendar year they end in
+FISCAL_YEAR_START_MONTH = 1
+
+# -------------------------
+# Result Cache
+# -------------------------
+# Memory cap for cached page results, shared by every session in the process
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Threads computing every page's results at once before the pages render, shared by
+# every session; 1 leaves each page to compute its own as it renders. Raise it only on
+# machines with cores to spare: on one core the pool made a rerun about 10% slower.
+PAGE_WORKERS = 1
+
+# -------------------------
+# Charts
+# -------------------------
+# Points drawn per line trace; longer series are downsampled to about this many unless
+# the page's "Show all points" toggle is on
+CHART_MAX_POINTS = 1000
+
+# -------------------------
+# Product Search
+# -------------------------
+# Most products the sidebar lists for a search, best matches first
+SEARCH_RESULT_LIMIT = 200
+
+# -------------------------
+# Tables
+# -------------------------
+# Rows sent to the browser per page of a large table; sorting and filtering run on the
+# server over all of its rows
+TABLE_PAGE_ROWS = 100
+
+# -------------------------
+# Instrumentation
+# -------------------------
+# Show under each page how often it has recomputed in this session
+SHOW_PAGE_RUNS = False
+
+# Stage runs (load, merge, cube, filter, pages) kept for the performance panel
+PROFILE_HISTORY = 1000
+
+# Performance panel with per-stage timings at the bottom of the sidebar
+SHOW_PERF_PANEL = False
+
+# Append every stage run to this file as a JSON line, e.g. "data/.cache/profile.jsonl"
+PROFILE_LOG_FILE = None
+
+# -------------------------
+# Benchmarks
+# -------------------------
+# Results python -m utils.benchmark compares against, and how much slower or bigger than
+# them a stage may get before it counts as a regression
+BENCHMARK_BASELINE = "benchmark_baseline.json"
+BENCHMARK_TOLERANCE = 0.25
@@ -0,0 +1,22 @@
+import importlib
+
+# Dashboard sections in display order, and whether each follows the sidebar filters.
+# A section's module, and the plotting libraries it uses, is imported the first time
+# the section is rendered.
+#
+# Each module has show(data[, spec]) to render the section, and jobs(data[, spec]) to
+# list the cached analytics calls show() will make, as (func, data, *args), for app.py
+# to compute ahead. Both read the section's widgets through the same helpers, which take
+# their values from st.session_state, so the calls listed are the ones show() makes.
+PAGES = {
+    "sales_inventory_page": True,
+    "revenue_trend": True,
+    "monthly_breakdown": True,
+    "food_nonholiday": False,
+    "product_threshold": True,
+    "cumulative_sales": True,
+    "cashflow_ratio": True,
+}
+
+def load_page(name):
+    return importlib.import_module(f"{__name__}.{name}")
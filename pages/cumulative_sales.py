@@ -1,52 +1,44 @@
 import streamlit as st
 import plotly.express as px
-import pandas as pd
+from utils.analytics import cumulative_series
+from utils.chart_helpers import downsample, point_caption
+from utils.instrumentation import track_page
+from utils.tables import paged_table
 
-def show(sales_df, selected_products, start_date, end_date):
+def measure():
+    # Measure accumulated, from the metric toggle as it stands
+    metric_option = st.session_state.get("cumulative_metric", "Revenue ($)")
+    return "sales_revenue" if metric_option == "Revenue ($)" else "units_sold"
+
+@st.fragment
+@track_page
+def show(data, spec):
     st.subheader("Sales Revenue - Cumulative by Product (Daily)")
 
     # Toggle for metric
     metric_option = st.radio(
         "View Metric",
         ["Revenue ($)", "Units Sold"],
-        horizontal=True
+        horizontal=True,
+        key="cumulative_metric"
     )
 
-    # Filter sales
-    filtered_sales = sales_df[
-        (sales_df["product_name"].isin(selected_products)) &
-        (sales_df["date"].between(start_date, end_date))
-    ].copy()
+    # Metric to accumulate
+    group_col = measure()
+    y_label = "Cumulative Sales ($)" if group_col == "sales_revenue" else "Cumulative Units Sold"
+
+    # Daily values and running totals per product
+    daily_grouped = cumulative_series(data, spec, group_col)
 
-    if filtered_sales.empty:
+    if daily_grouped.empty:
         st.warning("No matching sales data found for the selected filters.")
         return
 
-    # Compute metric values
-    filtered_sales["sales_revenue"] = filtered_sales["quantity_sold"] * filtered_sales["unit_retail_price_usd"]
-
-    # Group and sort
-    if metric_option == "Revenue ($)":
-        group_col = "sales_revenue"
-        y_label = "Cumulative Sales ($)"
-    else:
-        group_col = "quantity_sold"
-        y_label = "Cumulative Units Sold"
-
-    daily_grouped = (
-        filtered_sales.groupby(["product_name", "date"])[group_col]
-        .sum()
-        .reset_index()
-        .sort_values(["product_name", "date"])
-    )
-
-    daily_grouped["cumulative"] = (
-        daily_grouped.groupby("product_name")[group_col].cumsum()
-    )
-
-    # Line chart
+    # Line chart, downsampled per product unless every point is asked for
+    show_all = st.toggle("Show all points", key="cumulative_all_points")
+    chart_df = daily_grouped if show_all else downsample(daily_grouped, "date", "cumulative", "product_name")
     fig = px.line(
-        daily_grouped,
+        chart_df,
         x="date",
         y="cumulative",
         color="product_name",
@@ -59,6 +51,8 @@ def show(sales_df, selected_products, start_date, end_date):
     )
     fig.update_layout(height=500)
     st.plotly_chart(fig, use_container_width=True)
+    if len(chart_df) < len(daily_grouped):
+        st.caption(point_caption(len(chart_df), len(daily_grouped)))
 
     # Data preview
     with st.expander("🔍 View Data"):
@@ -68,7 +62,13 @@ def show(sales_df, selected_products, start_date, end_date):
             group_col: "Daily Value",
             "cumulative": y_label
         })
-        display_df["Date"] = pd.to_datetime(display_df["Date"]).dt.date
-        st.dataframe(display_df, use_container_width=True)
+        paged_table(
+            display_df,
+            key="cumulative_data",
+            column_config={"Date": st.column_config.DateColumn(format="YYYY-MM-DD")}
+        )
         
-    st.markdown("---")
\ No newline at end of file
+    st.markdown("---")
+
+def jobs(data, spec):
+    return [(cumulative_series, data, spec, measure())]
\ No newline at end of file
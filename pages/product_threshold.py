@@ -1,47 +1,19 @@
 import streamlit as st
-import plotly.express as px
-
-def show(sales_df, selected_products, start_date, end_date):
+import plotly.graph_objects as go
+from utils.analytics import above_threshold, product_ranking
+from utils.instrumentation import track_page
+from utils.tables import paged_table
+
+@st.fragment
+@track_page
+def show(data, spec):
     st.subheader("Products with High Sales Revenue")
 
-    # Filter using sidebar selections
-    filtered_sales = sales_df[
-        (sales_df["product_name"].isin(selected_products)) &
-        (sales_df["date"].between(start_date, end_date))
-    ].copy()
-
-    if filtered_sales.empty:
-        st.info("No matching sales found for the selected filters.")
-        return
-
-    # Compute revenue and realized cost
-    filtered_sales["sales_revenue"] = (
-        filtered_sales["quantity_sold"] * filtered_sales["unit_retail_price_usd"]
-    )
-    filtered_sales["realized_cost"] = (
-        filtered_sales["quantity_sold"] * filtered_sales["unit_cost_usd"]
-    )
-
-    # Aggregate metrics
-    product_sales = (
-        filtered_sales.groupby("product_name")
-        .agg(
-            sales_revenue=("sales_revenue", "sum"),
-            units_sold=("quantity_sold", "sum"),
-            realized_cost=("realized_cost", "sum")
-        )
-        .reset_index()
-    )
-
-    # Compute realized profit and profit %
-    product_sales["realized_profit"] = product_sales["sales_revenue"] - product_sales["realized_cost"]
-    product_sales["profit_pct"] = product_sales.apply(
-        lambda row: (row["realized_profit"] / row["realized_cost"] * 100) if row["realized_cost"] != 0 else 0,
-        axis=1
-    )
+    # Revenue, units, realized profit and profit % per product
+    product_sales = product_ranking(data, spec)
 
     if product_sales.empty:
-        st.info("No products found.")
+        st.info("No matching sales found for the selected filters.")
         return
 
     # Slider to set threshold
@@ -58,17 +30,13 @@ def show(sales_df, selected_products, start_date, end_date):
     )
 
     # Filter products
-    high_sellers = product_sales[product_sales["sales_revenue"] > threshold].sort_values(
-        by="sales_revenue", ascending=False
-    )
+    high_sellers = above_threshold(product_sales, threshold)
 
     if high_sellers.empty:
         st.warning("No products found with sales above the selected threshold.")
         return
 
     # Bar chart
-    import plotly.graph_objects as go
-
 # Initialize figure with bar traces
     fig = go.Figure()
 
@@ -121,12 +89,15 @@ def show(sales_df, selected_products, start_date, end_date):
         "profit_pct": "Profit %"
     })
 
-    # Step 2: Format Profit %
-    display_df["Profit %"] = display_df["Profit %"].map("{:.1f}%".format)
-
-    # Step 3: Display final table
-    st.dataframe(display_df[["Product", "Total Sales ($)", "Units Sold", "Profit ($)", "Profit %"]],
-                use_container_width=True)
+    # Step 2: Display final table, with Profit % formatted as the rows are shown
+    paged_table(
+        display_df[["Product", "Total Sales ($)", "Units Sold", "Profit ($)", "Profit %"]],
+        key="threshold_table",
+        column_config={"Profit %": st.column_config.NumberColumn(format="%.1f%%")}
+    )
 
 
     st.markdown("---")
+
+def jobs(data, spec):
+    return [(product_ranking, data, spec)]
\ No newline at end of file
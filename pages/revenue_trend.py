@@ -1,17 +1,19 @@
 import streamlit as st
 import plotly.express as px
+from utils.analytics import revenue_trend
+from utils.chart_helpers import downsample, point_caption
+from utils.instrumentation import track_page
 
-def add_period_column(df, date_col, level):
-    df = df.copy()
-    if level == "Weekly":
-        df["period"] = df[date_col].dt.to_period("W").apply(lambda r: r.start_time)
-    elif level == "Monthly":
-        df["period"] = df[date_col].dt.to_period("M").apply(lambda r: r.start_time)
-    else:
-        df["period"] = df[date_col]
-    return df
-
-def show(sales_filtered, inventory_filtered):
+# Cube grain behind each aggregation level
+GRAINS = {"Daily": "day", "Weekly": "week", "Monthly": "month"}
+
+def grain():
+    # Cube grain for the aggregation level as it stands
+    return GRAINS[st.session_state.get("agg_over_time", "Daily")]
+
+@st.fragment
+@track_page
+def show(data, spec):
     st.subheader("Sales Revenue & Inventory Cost - Overall Trend")
 
     agg_level = st.selectbox(
@@ -20,16 +22,14 @@ def show(sales_filtered, inventory_filtered):
         key="agg_over_time"
     )
 
-    sales_chart = add_period_column(sales_filtered, "date", agg_level)
-    inventory_chart = add_period_column(inventory_filtered, "date", agg_level)
-
-    sales_agg = sales_chart.groupby("period")["sales_revenue"].sum().reset_index()
-    inventory_agg = inventory_chart.groupby("period")["inventory_cost"].sum().reset_index()
-
-    revenue_trend = sales_agg.merge(inventory_agg, on="period", how="outer").fillna(0)
+    trend = revenue_trend(data, spec, grain())
+    trend = trend.melt(id_vars="period", value_vars=["sales_revenue", "inventory_cost"])
 
+    # Long daily ranges are downsampled per metric unless every point is asked for
+    show_all = st.toggle("Show all points", key="trend_all_points")
+    chart_df = trend if show_all else downsample(trend, "period", "value", "variable")
     fig = px.line(
-        revenue_trend.melt(id_vars="period", value_vars=["sales_revenue", "inventory_cost"]),
+        chart_df,
         x="period",
         y="value",
         color="variable",
@@ -38,4 +38,9 @@ def show(sales_filtered, inventory_filtered):
     )
 
     st.plotly_chart(fig, use_container_width=True)
-    st.markdown("---")
\ No newline at end of file
+    if len(chart_df) < len(trend):
+        st.caption(point_caption(len(chart_df), len(trend)))
+    st.markdown("---")
+
+def jobs(data, spec):
+    return [(revenue_trend, data, spec, grain())]
\ No newline at end of file
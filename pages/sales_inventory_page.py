@@ -1,54 +1,35 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-
-def show(sales_filtered, inventory_filtered):
+from utils.analytics import product_summary
+from utils.instrumentation import track_page
+from utils.tables import paged_table
+
+def group_column():
+    # Column the summary groups by, from its toggle as it stands
+    group_by = st.session_state.get("summary_group_by", "Product Name")
+    return "product_name" if group_by == "Product Name" else "type"
+
+@st.fragment
+@track_page
+def show(data, spec):
     st.markdown("---")
     st.subheader("Sales Revenue & Inventory Cost - Overall by Product")
 
-    # Step 1: Add monetary value columns
-    sales_filtered["sales_revenue"] = sales_filtered["quantity_sold"] * sales_filtered["unit_retail_price_usd"]
-    inventory_filtered["inventory_cost"] = inventory_filtered["quantity_purchased"] * inventory_filtered["unit_cost_usd"]
-
     # Toggle to group by Product Name or Product Type
-    group_by = st.radio("Group By", ["Product Name", "Product Type"], horizontal=True)
-    group_col = "product_name" if group_by == "Product Name" else "type"
-
-    # Step 2: Aggregate revenue and cost
-    revenue_by_product = sales_filtered.groupby(group_col)["sales_revenue"].sum().reset_index()
-    cost_by_product = inventory_filtered.groupby(group_col)["inventory_cost"].sum().reset_index()
-
-    # Step 3: Compute realized cost (only for sold quantity)
-    realized_costs = sales_filtered.copy()
-    realized_costs["realized_cost"] = realized_costs["quantity_sold"] * realized_costs["unit_cost_usd"]
-    cost_by_realized = realized_costs.groupby(group_col)["realized_cost"].sum().reset_index()
-
-    # Step 4: Merge all metrics
-    product_dollars = revenue_by_product.merge(cost_by_product, on=group_col, how="outer").fillna(0)
-    product_dollars = product_dollars.merge(cost_by_realized, on=group_col, how="left").fillna(0)
+    group_by = st.radio("Group By", ["Product Name", "Product Type"], horizontal=True, key="summary_group_by")
+    group_col = group_column()
 
-    product_dollars["realized_profit"] = product_dollars["sales_revenue"] - product_dollars["realized_cost"]
-    product_dollars["profit_pct"] = product_dollars.apply(
-        lambda row: (row["realized_profit"] / row["realized_cost"] * 100) if row["realized_cost"] else 0,
-        axis=1
-    )
+    # Step 1: Revenue, inventory cost and realized profit per group, largest sellers first
+    product_dollars, kpis = product_summary(data, spec, group_col)
 
-    # Step 5: KPI Cards
+    # Step 2: KPI Cards
     col1, col2, col3, col4 = st.columns(4)
-    total_sales = product_dollars["sales_revenue"].sum()
-    total_inventory_cost = product_dollars["inventory_cost"].sum()
-    total_realized_cost = product_dollars["realized_cost"].sum()
-    total_profit = total_sales - total_realized_cost
-    profit_pct = (total_profit / total_realized_cost * 100) if total_realized_cost else 0
-
-    col1.metric("💰 Total Sales", f"${total_sales:,.0f}")
-    col2.metric("📦 Inventory Cost", f"${total_inventory_cost:,.0f}")
-    col3.metric("💵 Realized Profit", f"${total_profit:,.0f}")
-    col4.metric("📈 Profit %", f"{profit_pct:.1f}%")
-
-    # Step 6: Grouped Bar Chart + Profit % Line
-    product_dollars = product_dollars.sort_values(by="sales_revenue", ascending=False)
+    col1.metric("💰 Total Sales", f"${kpis['sales_revenue']:,.0f}")
+    col2.metric("📦 Inventory Cost", f"${kpis['inventory_cost']:,.0f}")
+    col3.metric("💵 Realized Profit", f"${kpis['realized_profit']:,.0f}")
+    col4.metric("📈 Profit %", f"{kpis['profit_pct']:.1f}%")
 
+    # Step 3: Grouped Bar Chart + Profit % Line
     fig = px.bar(
         product_dollars,
         x=group_col,
@@ -74,7 +55,7 @@ def show(sales_filtered, inventory_filtered):
 
     st.plotly_chart(fig, use_container_width=True)
 
-    # Step 7: Expandable Table
+    # Step 4: Expandable Table
     with st.expander(" 🔽 See Product-Level Details"):
         product_table = product_dollars[[group_col, "sales_revenue", "inventory_cost", "realized_profit", "profit_pct"]]
         product_table = product_table.rename(columns={
@@ -85,7 +66,13 @@ def show(sales_filtered, inventory_filtered):
             "profit_pct": "Profit %"
         }).sort_values("Sales ($)", ascending=False)
 
-        product_table["Profit %"] = product_table["Profit %"].map(lambda x: f"{x:.1f}%")
-        st.dataframe(product_table, use_container_width=True)
+        paged_table(
+            product_table,
+            key="summary_table",
+            column_config={"Profit %": st.column_config.NumberColumn(format="%.1f%%")}
+        )
+
+    st.markdown("---")
 
-    st.markdown("---")
\ No newline at end of file
+def jobs(data, spec):
+    return [(product_summary, data, spec, group_column())]
\ No newline at end of file
@@ -0,0 +1,10 @@
+import os
+
+import pytest
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # An empty data/ folder to run in, as DATA_DIR and CACHE_DIR are relative paths
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    return tmp_path / "data"
@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.test_dense_merge import ANALYSES, assert_same, specs
+from utils.analytics import append_facts, build_dataset, holiday_kpis
+from utils.calendar import add_calendar_columns
+from utils.cube import cube_differences
+from utils.data_loader import load_data, load_state, read_appended, source_stats
+from utils.setup_data import frame_batches, partition_keys, update_fact_partitions
+from utils.synthetic_data import generate, write_tables
+
+# A dataset built from the facts up to some day, with the rest appended a day at a time,
+# against one built from all of them. A few rows of earlier days arrive late, with a
+# later day's batch, so appends also land on days the cube already has.
+
+DAYS = 120
+APPENDED_DAYS = 30
+LATE_DAY = DAYS - APPENDED_DAYS + 10
+
+# Weeks with no inventory cost have an infinite cashflow ratio, and the change between two
+# of them is NaN, with numpy warning about it
+pytestmark = pytest.mark.filterwarnings("ignore:invalid value encountered:RuntimeWarning")
+
+@pytest.fixture(scope="module")
+def tables():
+    # Without exact duplicates, which only the duplicate policies would tell apart
+    f_sales, f_inventory, d_products, d_date = generate(3000, n_days=DAYS, density=0.3, duplicate_rate=0, seed=5)
+    f_sales, f_inventory = f_sales.drop_duplicates(ignore_index=True), f_inventory.drop_duplicates(ignore_index=True)
+    return f_sales, f_inventory, d_products, add_calendar_columns(d_date)
+
+def arrival_days(df, seed):
+    # Day each fact row arrives on: its own, or LATE_DAY for 2% of the earlier rows
+    late = (np.random.default_rng(seed).random(len(df)) < 0.02) & (df["date_id"] < LATE_DAY).to_numpy()
+    return np.where(late, LATE_DAY, df["date_id"])
+
+def assert_matches_full(data, full, d_products, d_date):
+    assert cube_differences(data["cube"], full["cube"]) == []
+    for analysis, run in ANALYSES.items():
+        for name, spec in specs(d_products, d_date).items():
+            try:
+                assert_same(run(data, spec), run(full, spec))
+            except AssertionError as error:
+                raise AssertionError(f"{analysis}, {name}: {error}") from None
+    assert_same(holiday_kpis(data), holiday_kpis(full))
+
+def test_daily_appends_match_full_build(tables):
+    f_sales, f_inventory, d_products, d_date = tables
+    arrivals = [arrival_days(f_sales, 1), arrival_days(f_inventory, 2)]
+    first = DAYS - APPENDED_DAYS
+    data = build_dataset(*[df[day <= first] for df, day in zip((f_sales, f_inventory), arrivals)], d_products, d_date)
+
+    compactions = 0
+    for upto in range(first + 1, DAYS + 1):
+        batch = [df[day == upto] for df, day in zip((f_sales, f_inventory), arrivals)]
+        had_delta = data["cube"]["delta"] is not None
+        data = append_facts(data, *batch)
+        compactions += had_delta and data["cube"]["delta"] is None
+        if upto in (LATE_DAY, DAYS):
+            arrived = [df[day <= upto] for df, day in zip((f_sales, f_inventory), arrivals)]
+            assert_matches_full(data, build_dataset(*arrived, d_products, d_date), d_products, d_date)
+
+    # The appended rows passed APPEND_COMPACT_SHARE of the cube, so were folded in on the way
+    assert compactions > 0
+
+# ------------------------------------------------------------------
+# Appended fact segments read from data/
+# ------------------------------------------------------------------
+
+def write_facts(f_sales, f_inventory, d_date):
+    for name, df in (("f_sales", f_sales), ("f_inventory", f_inventory)):
+        update_fact_partitions(name, frame_batches(df.groupby(partition_keys(df, d_date))))
+
+def appended(state, data):
+    result = read_appended(state)
+    assert result is not None
+    (sales, inventory), state = result
+    return state, append_facts(data, sales, inventory)
+
+@pytest.mark.parametrize("policy", ["first", "sum", "reject"])
+def test_read_appended_matches_load_data(tables, data_dir, policy):
+    f_sales, f_inventory, d_products, d_date = tables
+    write_tables((f_sales.iloc[:0], f_inventory.iloc[:0], d_products, d_date), str(data_dir))
+    os.remove(data_dir / "f_sales.csv")
+    os.remove(data_dir / "f_inventory.csv")
+
+    def upto(day):
+        return f_sales[f_sales["date_id"] <= day], f_inventory[f_inventory["date_id"] <= day]
+
+    write_facts(*upto(DAYS - 2), d_date)
+    loaded = load_data(duplicate_policy=policy)
+    state = load_state(loaded[0], loaded[1], source_stats(), policy)
+    data = build_dataset(*loaded)
+
+    # The next day, clean
+    write_facts(*upto(DAYS - 1), d_date)
+    state, data = appended(state, data)
+
+    # The last day, with a copy of a row loaded at first and of one appended since
+    sales, inventory = upto(DAYS)
+    old_row = sales[sales["date_id"] == DAYS - 10].iloc[:1]
+    recent_row = sales[sales["date_id"] == DAYS - 1].iloc[:1]
+    write_facts(pd.concat([sales, old_row, recent_row], ignore_index=True), inventory, d_date)
+    if policy == "reject":
+        with pytest.raises(ValueError, match="2 duplicate fact rows"):
+            read_appended(state)
+        return
+    state, data = appended(state, data)
+
+    full = build_dataset(*load_data(duplicate_policy=policy))
+    assert_matches_full(data, full, d_products, d_date)
+    if policy == "first":
+        assert len(state["hashes"]["f_sales"][0]) + len(state["hashes"]["f_sales"][1]) == len(sales)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from utils.chart_helpers import downsample
+
+# downsample on long-format chart data: three traces, two over the budget and one right at
+# it, their rows interleaved as the pages' melted frames have them
+
+MAX_POINTS = 100
+SIZES = {"a": 5000, "b": 2000, "c": MAX_POINTS}
+
+def chart_data():
+    rng = np.random.default_rng(3)
+    traces = [
+        pd.DataFrame({"x": np.arange(n), "trace": name, "y": rng.normal(size=n).cumsum()})
+        for name, n in SIZES.items()
+    ]
+    df = pd.concat(traces).sort_values(["x", "trace"], ignore_index=True)
+    return df.set_axis(df.index + 1000)
+
+def test_every_trace_within_budget():
+    df = chart_data()
+    kept = downsample(df, "x", "y", "trace", MAX_POINTS)
+    for name, n in SIZES.items():
+        rows = kept[kept["trace"] == name]
+        if n <= MAX_POINTS:
+            pd.testing.assert_frame_equal(rows, df[df["trace"] == name])
+        else:
+            assert MAX_POINTS // 2 <= len(rows) <= MAX_POINTS
+
+    # Rows keep their labels and order
+    assert kept.index.is_monotonic_increasing
+    pd.testing.assert_frame_equal(kept, df.loc[kept.index])
+
+def test_first_last_and_extremes_of_every_bucket_kept():
+    df = chart_data()
+    kept = downsample(df, "x", "y", "trace", MAX_POINTS)
+    buckets = (MAX_POINTS - 2) // 2
+    for name, n in SIZES.items():
+        if n <= MAX_POINTS:
+            continue
+        rows = df[df["trace"] == name]
+        kept_x = set(kept.loc[kept["trace"] == name, "x"])
+        assert {0, n - 1} <= kept_x
+        for _, bucket in rows.groupby(np.arange(n) * buckets // n):
+            assert bucket.loc[bucket["y"].idxmin(), "x"] in kept_x
+            assert bucket.loc[bucket["y"].idxmax(), "x"] in kept_x
+
+def test_data_within_budget_is_untouched():
+    df = chart_data()
+    small = df[df["trace"] == "c"]
+    assert downsample(small, "x", "y", "trace", MAX_POINTS) is small
+    assert downsample(df, "x", "y", "trace", max(SIZES.values())) is df
+    assert downsample(df.iloc[:0], "x", "y", "trace", MAX_POINTS).empty
+
+def test_without_group_one_trace():
+    df = chart_data()
+    trace = df[df["trace"] == "a"]
+    kept = downsample(trace, "x", "y", max_points=MAX_POINTS)
+    assert len(kept) <= MAX_POINTS
+    assert kept["y"].min() == trace["y"].min() and kept["y"].max() == trace["y"].max()
+    assert kept["x"].iloc[0] == 0 and kept["x"].iloc[-1] == SIZES["a"] - 1
@@ -0,0 +1,101 @@
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+import pytest
+
+from utils.data_loader import LOAD_REPORT, clean_facts, read_csv, read_csv_cached, read_manifest
+
+# The loader's Feather cache, against a scratch data/ folder, and its duplicate policies
+
+D_PRODUCTS = pd.DataFrame({
+    "product_id": [1, 2, 3],
+    "product_name": ["apple", "soap", "bread"],
+    "type": ["food", "non-food", "food"],
+    "unit_cost_usd": [0.5, 1.25, 2.0],
+    "unit_retail_price_usd": [1.0, 3.5, 4.25],
+})
+D_DATE = pd.DataFrame({"date_id": [1, 2, 3], "date": ["2021-01-01", "2021-01-02", "2021-01-03"], "is_holiday": [1, 0, 0]})
+
+def test_cached_read_maps_numeric_columns(data_dir, monkeypatch):
+    # Address of each column's values in the memory-mapped Feather table, taken before
+    # to_pandas releases the table
+    mapped = {}
+    read_table = feather.read_table
+
+    def recording_read_table(*args, **kwargs):
+        table = read_table(*args, **kwargs)
+        for column in table.column_names:
+            if table.column(column).num_chunks == 1 and len(table.column(column).chunk(0).buffers()) == 2:
+                mapped[column] = table.column(column).chunk(0).buffers()[1].address
+        return table
+
+    monkeypatch.setattr(feather, "read_table", recording_read_table)
+    for name, df, numeric in (
+        ("d_products", D_PRODUCTS, ["product_id", "unit_cost_usd", "unit_retail_price_usd"]),
+        ("d_date", D_DATE, ["date_id", "date", "is_holiday"]),
+    ):
+        path = str(data_dir / f"{name}.csv")
+        df.to_csv(path, index=False)
+        parsed = read_csv_cached(name, path, read_manifest())
+        assert not mapped
+
+        cached = read_csv_cached(name, path, read_manifest())
+        pd.testing.assert_frame_equal(cached, parsed)
+        pd.testing.assert_frame_equal(cached, read_csv(name, path))
+        for column in numeric:
+            values = cached[column].to_numpy()
+            assert values.__array_interface__["data"][0] == mapped[column], column
+            assert not values.flags.writeable
+        mapped.clear()
+
+# ------------------------------------------------------------------
+# Duplicate fact rows
+# ------------------------------------------------------------------
+
+SHIPPED_INVENTORY = os.path.join(os.path.dirname(__file__), "..", "data", "f_inventory.csv")
+
+def inventory(*rows):
+    return pd.DataFrame(list(rows), columns=["product_id", "date_id", "quantity_purchased"]).astype("int32")
+
+def rows(df):
+    return sorted(map(tuple, df.to_numpy().tolist()))
+
+# Three copies of one row, and a row with the same keys but another quantity
+FACTS = inventory((1, 1, 5), (2, 1, 5), (1, 1, 5), (1, 1, 6), (1, 1, 5))
+
+@pytest.mark.parametrize("policy, expected", [
+    ("first", [(1, 1, 5), (1, 1, 6), (2, 1, 5)]),
+    ("sum", [(1, 1, 6), (1, 1, 15), (2, 1, 5)]),
+])
+def test_duplicates_are_merged(policy, expected):
+    kept = clean_facts("f_inventory", FACTS, policy)
+    assert rows(kept) == expected
+    assert kept.dtypes.to_dict() == FACTS.dtypes.to_dict()
+    assert LOAD_REPORT["f_inventory"] == {"rows": 5, "dropped": 2, "policy": policy}
+
+def test_duplicates_are_rejected():
+    with pytest.raises(ValueError, match="f_inventory: 2 duplicate fact rows"):
+        clean_facts("f_inventory", FACTS, "reject")
+    assert LOAD_REPORT["f_inventory"] == {"rows": 5, "dropped": 2, "policy": "reject"}
+
+def test_facts_without_duplicates_are_returned_as_they_are():
+    df = FACTS.drop_duplicates()
+    for policy in ("first", "sum", "reject"):
+        assert clean_facts("f_inventory", df, policy) is df
+        assert LOAD_REPORT["f_inventory"] == {"rows": 3, "dropped": 0, "policy": policy}
+
+def test_unknown_policy_is_refused():
+    with pytest.raises(ValueError, match="Unknown duplicate policy 'last'"):
+        clean_facts("f_inventory", FACTS, "last")
+
+@pytest.mark.parametrize("policy, quantity", [("first", 8), ("sum", 16)])
+def test_shipped_inventory_duplicate(policy, quantity):
+    # data/f_inventory.csv lists product 1 on day 104 twice, with 8 units each time
+    df = read_csv("f_inventory", SHIPPED_INVENTORY)
+    assert rows(df[(df["product_id"] == 1) & (df["date_id"] == 104)]) == [(1, 104, 8), (1, 104, 8)]
+    kept = clean_facts("f_inventory", df, policy)
+    assert rows(kept[(kept["product_id"] == 1) & (kept["date_id"] == 104)]) == [(1, 104, quantity)]
+    assert LOAD_REPORT["f_inventory"]["dropped"] == len(df) - len(df.drop_duplicates())
+    with pytest.raises(ValueError, match="duplicate fact rows"):
+        clean_facts("f_inventory", df, "reject")
@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from utils.analytics import (
+    build_dataset,
+    cashflow_kpis,
+    cashflow_series,
+    cumulative_series,
+    filter_spec,
+    holiday_kpis,
+    monthly_breakdown,
+    product_ranking,
+    product_summary,
+    revenue_trend,
+    shared_dataset,
+)
+from utils.calendar import add_calendar_columns
+from utils.cube import build_cube
+from utils.data_loader import merge_dimensions
+from utils.synthetic_data import generate
+
+# Every analysis on the sparse merge the app uses against the same analysis on the
+# dense date x product matrix, whose explicit zero rows are what fill_gaps stands in for.
+
+@pytest.fixture(scope="module")
+def datasets():
+    f_sales, f_inventory, d_products, d_date = generate(4000, n_days=150, density=0.3, seed=7)
+    d_date = add_calendar_columns(d_date)
+    sparse = build_dataset(f_sales, f_inventory, d_products, d_date)
+    sales_df, inventory_df = merge_dimensions(f_sales, f_inventory, d_products, d_date, dense=True)
+    dense = shared_dataset(build_cube(sales_df, inventory_df), d_products, d_date, None)
+    return sparse, dense, d_products, d_date
+
+def specs(d_products, d_date):
+    names = d_products["product_name"].astype(str).tolist()
+    first, last = d_date["date"].min(), d_date["date"].max()
+    return {
+        "everything": filter_spec(names, first, last),
+        "some products, mid-week to mid-month": filter_spec(names[::3], first + pd.Timedelta(days=10), last - pd.Timedelta(days=17)),
+        "one product, one day": filter_spec(names[:1], first + pd.Timedelta(days=40), first + pd.Timedelta(days=40)),
+        "no products": filter_spec([], first, last),
+    }
+
+ANALYSES = {
+    "product_summary by product": lambda data, spec: product_summary(data, spec, "product_name"),
+    "product_summary by type": lambda data, spec: product_summary(data, spec, "type"),
+    "revenue_trend daily": lambda data, spec: revenue_trend(data, spec, "day"),
+    "revenue_trend weekly": lambda data, spec: revenue_trend(data, spec, "week"),
+    "revenue_trend monthly": lambda data, spec: revenue_trend(data, spec, "month"),
+    "monthly_breakdown by product": lambda data, spec: monthly_breakdown(data, spec, "product_name"),
+    "monthly_breakdown by type": lambda data, spec: monthly_breakdown(data, spec, "type"),
+    "product_ranking": product_ranking,
+    "cumulative_series revenue": lambda data, spec: cumulative_series(data, spec, "sales_revenue"),
+    "cumulative_series units": lambda data, spec: cumulative_series(data, spec, "units_sold"),
+    "cashflow overall": lambda data, spec: cashflow_kpis(cashflow_series(data, spec, None)),
+    "cashflow by type": lambda data, spec: cashflow_series(data, spec, "type"),
+    "cashflow by product": lambda data, spec: cashflow_series(data, spec, "product_name"),
+}
+
+def assert_same(result, expected):
+    if isinstance(result, pd.DataFrame):
+        pd.testing.assert_frame_equal(
+            result.reset_index(drop=True), expected.reset_index(drop=True), check_exact=False, rtol=1e-9,
+        )
+    elif isinstance(result, dict):
+        assert result.keys() == expected.keys()
+        for key in result:
+            assert_same(result[key], expected[key])
+    elif isinstance(result, tuple):
+        assert len(result) == len(expected)
+        for a, b in zip(result, expected):
+            assert_same(a, b)
+    else:
+        assert result == pytest.approx(expected, rel=1e-9, nan_ok=True)
+
+@pytest.mark.parametrize("analysis", ANALYSES)
+def test_sparse_merge_matches_dense(datasets, analysis):
+    sparse, dense, d_products, d_date = datasets
+    for name, spec in specs(d_products, d_date).items():
+        result = ANALYSES[analysis](sparse, spec)
+        expected = ANALYSES[analysis](dense, spec)
+        try:
+            assert_same(result, expected)
+        except AssertionError as error:
+            raise AssertionError(f"{analysis}, {name}: {error}") from None
+
+def test_holiday_kpis_match_dense(datasets):
+    sparse, dense, _, _ = datasets
+    assert_same(holiday_kpis(sparse), holiday_kpis(dense))
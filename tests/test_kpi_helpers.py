@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.kpi_helpers import cashflow_ratio, profit_pct
+
+# The row-wise expressions the pages used before kpi_helpers, as the reference.
+# Profit % was guarded two ways (truthiness and != 0), which agree on every input.
+
+def old_profit_pct_truthy(profit, base):
+    return (profit / base) * 100 if base else 0
+
+def old_profit_pct_nonzero(profit, base):
+    return (profit / base * 100) if base != 0 else 0
+
+def old_cashflow_ratio(sales, cost):
+    return sales / cost if cost != 0 else float("inf")
+
+# inf / inf is NaN on both sides, with numpy warning about it
+pytestmark = pytest.mark.filterwarnings("ignore:invalid value encountered:RuntimeWarning")
+
+NUMERATORS = [0.0, 5.0, -5.0, 12.5, np.nan, np.inf, -np.inf]
+DENOMINATORS = [0.0, -0.0, 4.0, -4.0, 0.25, np.nan, np.inf, -np.inf]
+
+def frame():
+    # Every numerator against every denominator
+    rows = [(n, d) for n in NUMERATORS for d in DENOMINATORS]
+    return pd.DataFrame(rows, columns=["num", "den"], index=pd.RangeIndex(10, 10 + len(rows)))
+
+def same(a, b):
+    return (math.isnan(a) and math.isnan(b)) or a == b
+
+@pytest.mark.parametrize("old", [old_profit_pct_truthy, old_profit_pct_nonzero])
+def test_profit_pct_matches_apply(old):
+    df = frame()
+    expected = df.apply(lambda row: old(row["num"], row["den"]), axis=1).astype("float64")
+    result = profit_pct(df["num"], df["den"])
+    assert isinstance(result, pd.Series)
+    pd.testing.assert_series_equal(result, expected, check_names=False)
+
+def test_cashflow_ratio_matches_apply():
+    df = frame()
+    expected = df.apply(lambda row: old_cashflow_ratio(row["num"], row["den"]), axis=1).astype("float64")
+    result = cashflow_ratio(df["num"], df["den"])
+    assert isinstance(result, pd.Series)
+    pd.testing.assert_series_equal(result, expected, check_names=False)
+
+@pytest.mark.parametrize("num", NUMERATORS)
+@pytest.mark.parametrize("den", DENOMINATORS)
+def test_scalars_match_old_expressions(num, den):
+    assert same(float(profit_pct(num, den)), float(old_profit_pct_truthy(num, den)))
+    assert same(float(profit_pct(num, den)), float(old_profit_pct_nonzero(num, den)))
+    assert same(float(cashflow_ratio(num, den)), float(old_cashflow_ratio(num, den)))
+
+def test_scalars_stay_scalars():
+    assert np.ndim(profit_pct(1.0, 4.0)) == 0
+    assert np.ndim(cashflow_ratio(1.0, 0.0)) == 0
+    assert cashflow_ratio(1.0, 0.0) == np.inf
+    assert profit_pct(1.0, 0) == 0
+
+def test_integer_series_and_empty():
+    pd.testing.assert_series_equal(
+        profit_pct(pd.Series([1, 2, 3]), pd.Series([4, 0, -3])),
+        pd.Series([25.0, 0.0, -100.0]),
+    )
+    empty = pd.Series([], dtype="float64")
+    assert cashflow_ratio(empty, empty).empty
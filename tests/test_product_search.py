@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from utils.product_search import build_index, candidates, search
+
+# The sidebar's product lookup on a handful of names: which products are checked, which
+# match, and in what order they come back
+
+D_PRODUCTS = pd.DataFrame([
+    ("Pineapple", "food"),
+    ("apple", "food"),
+    ("Apple Pie", "food"),
+    ("Crab Apple", "food"),
+    ("green_apple", "food"),
+    ("Applesauce", "food"),
+    ("Snapple", "non-food"),
+    ("apple leap", "non-food"),
+    ("Pie Tin", "non-food"),
+    ("Grapes", "food"),
+], columns=["product_name", "type"])
+
+INDEX = build_index(D_PRODUCTS)
+
+def names(positions):
+    return sorted(INDEX["names"][positions].tolist())
+
+def test_short_terms_check_every_product():
+    for term in ("a", "ap"):
+        assert np.array_equal(candidates(INDEX, term), np.arange(len(D_PRODUCTS)))
+    assert search(INDEX, "ap") == (
+        ["Apple Pie", "Applesauce", "apple", "apple leap", "Crab Apple", "green_apple", "Grapes", "Pineapple", "Snapple"], 9,
+    )
+    assert search(INDEX, "T") == (["Pie Tin"], 1)
+
+def test_candidates_hold_every_gram():
+    assert names(candidates(INDEX, "pie")) == ["Apple Pie", "Pie Tin"]
+    assert names(candidates(INDEX, "xyz")) == []
+
+def test_grams_apart_in_a_name_do_not_match():
+    # "apple leap" holds ple, lea and eap, but not "pleap"
+    assert names(candidates(INDEX, "pleap")) == ["apple leap"]
+    assert search(INDEX, "pleap") == ([], 0)
+
+def test_matches_are_ranked_then_alphabetical():
+    # Exact, then starting with the term, then a word starting with it, then the rest;
+    # alphabetical (capitals first) within each
+    assert search(INDEX, " APPLE ") == ([
+        "apple",
+        "Apple Pie", "Applesauce", "apple leap",
+        "Crab Apple", "green_apple",
+        "Pineapple", "Snapple",
+    ], 8)
+
+def test_product_type_filter():
+    assert search(INDEX, "apple", "non-food") == (["apple leap", "Snapple"], 2)
+    assert search(INDEX, "ap", "non-food") == (["apple leap", "Snapple"], 2)
+    assert search(INDEX, "apple", "toys") == ([], 0)
+
+def test_limit_keeps_the_best_and_counts_them_all():
+    assert search(INDEX, "apple", limit=3) == (["apple", "Apple Pie", "Applesauce"], 8)
+    assert search(INDEX, "apple", "food", limit=2) == (["apple", "Apple Pie"], 6)
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from tests.test_dense_merge import ANALYSES, specs
+from utils.analytics import build_dataset, check_dataset, product_summary
+from utils.calendar import add_calendar_columns
+from utils.synthetic_data import generate
+
+# The shared dataset's guards: writes into its frozen frames raise where they happen, and
+# check_dataset() catches columns added, replaced or dropped since it was built
+
+pytestmark = pytest.mark.filterwarnings("ignore:invalid value encountered:RuntimeWarning")
+
+@pytest.fixture
+def data():
+    f_sales, f_inventory, d_products, d_date = generate(2000, n_days=60, density=0.3, seed=11)
+    return build_dataset(f_sales, f_inventory, d_products, add_calendar_columns(d_date))
+
+def test_untouched_dataset_passes(data):
+    check_dataset(data, "test")
+    d_products, d_date = data["products"], data["dates"]
+    for run in ANALYSES.values():
+        for spec in specs(d_products, d_date).values():
+            run(data, spec)
+    check_dataset(data, "test")
+
+@pytest.mark.parametrize("grain", ["day", "week", "month"])
+def test_writes_into_cube_frames_raise(data, grain):
+    df = data["cube"][grain]
+    before = df.copy()
+    first = df["product_name"].iloc[0]
+    for column, value in (("sales_revenue", 1.5), ("units_sold", 7), ("product_name", first)):
+        position = df.columns.get_loc(column)
+        with pytest.raises(ValueError, match="read-only"):
+            df.iloc[0, position] = value
+        with pytest.raises(ValueError, match="read-only"):
+            df.loc[df.index[-1], column] = value
+        with pytest.raises((ValueError, TypeError)):
+            df.iloc[:, position] = value
+    with pytest.raises(ValueError, match="read-only"):
+        df.iloc[:2] = df.iloc[2:4].to_numpy()
+
+    pd.testing.assert_frame_equal(df, before)
+    check_dataset(data, "test")
+
+@pytest.mark.parametrize("change", [
+    lambda df: df.__setitem__("margin", 0.0),
+    lambda df: df.__setitem__("sales_revenue", df["sales_revenue"] * 2),
+    lambda df: df.drop(columns="realized_cost", inplace=True),
+])
+def test_column_changes_to_the_cube_are_caught(data, change):
+    change(data["cube"]["day"])
+    with pytest.raises(RuntimeError, match="page x modified the shared dataset"):
+        check_dataset(data, "page x")
+
+def test_column_added_to_a_dimension_is_caught(data):
+    data["products"]["margin"] = data["products"]["unit_retail_price_usd"] - data["products"]["unit_cost_usd"]
+    with pytest.raises(RuntimeError, match="modified the shared dataset"):
+        check_dataset(data, "test")
+
+def test_cached_results_are_frozen(data):
+    spec = next(iter(specs(data["products"], data["dates"]).values()))
+    totals, _ = product_summary(data, spec, "product_name")
+    with pytest.raises(ValueError, match="read-only"):
+        totals.iloc[0, totals.columns.get_loc("sales_revenue")] = 0.0
+    assert product_summary(data, spec, "product_name")[0] is totals
@@ -0,0 +1,135 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import utils.result_cache as result_cache
+from pages import PAGES, load_page
+from tests.test_dense_merge import assert_same, specs
+from utils.analytics import (
+    build_dataset,
+    cashflow_series,
+    cumulative_series,
+    monthly_breakdown,
+    product_summary,
+    revenue_trend,
+)
+from utils.calendar import add_calendar_columns
+from utils.result_cache import ResultCache, compute_ahead
+from utils.synthetic_data import generate
+
+# ResultCache on its own: what it keeps, for which generation, and what it counts; and
+# compute_ahead filling it from a pool
+
+SIZE = sys.getsizeof(b"x" * 100)
+
+def value(tag):
+    # 100 bytes, told apart by their first byte
+    return tag.encode() + b"x" * 99
+
+def get(cache, computed, generation, key):
+    # The cached value of key, noting in computed when it had to be computed
+    def compute():
+        computed.append(key)
+        return value(key)
+    return cache.get_or_compute(generation, key, compute)
+
+def test_hits_are_served_without_computing():
+    cache, computed = ResultCache(10 * SIZE), []
+    assert get(cache, computed, 1, "a") == value("a")
+    assert get(cache, computed, 1, "a") == value("a")
+    assert get(cache, computed, 1, "b") == value("b")
+    assert computed == ["a", "b"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 2, 0)
+    assert (stats["entries"], stats["bytes"], stats["generation"]) == (2, 2 * SIZE, 1)
+
+def test_newer_generation_clears_the_cache():
+    cache, computed = ResultCache(10 * SIZE), []
+    get(cache, computed, 1, "a")
+    get(cache, computed, 1, "b")
+    get(cache, computed, 2, "a")
+    assert computed == ["a", "b", "a"]
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["generation"]) == (1, SIZE, 2)
+
+def test_older_generation_computes_without_storing():
+    cache, computed = ResultCache(10 * SIZE), []
+    get(cache, computed, 2, "a")
+    assert get(cache, computed, 1, "a") == value("a")
+    assert get(cache, computed, 1, "b") == value("b")
+    assert get(cache, computed, 1, "b") == value("b")
+    assert computed == ["a", "a", "b", "b"]
+
+    # The newer generation's entries are still there
+    get(cache, computed, 2, "a")
+    assert computed == ["a", "a", "b", "b"]
+    stats = cache.stats()
+    assert (stats["entries"], stats["generation"], stats["hits"], stats["misses"]) == (1, 2, 1, 4)
+
+def test_value_larger_than_the_cache_is_not_stored():
+    cache, computed = ResultCache(SIZE - 1), []
+    assert get(cache, computed, 1, "a") == value("a")
+    get(cache, computed, 1, "a")
+    assert computed == ["a", "a"]
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (0, 0, 0)
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache, computed = ResultCache(3 * SIZE), []
+    for key in ("a", "b", "c"):
+        get(cache, computed, 1, key)
+
+    # Reading a makes b the oldest, so d evicts b and then e evicts c
+    get(cache, computed, 1, "a")
+    get(cache, computed, 1, "d")
+    assert list(cache.entries) == ["c", "a", "d"]
+    get(cache, computed, 1, "e")
+    assert list(cache.entries) == ["a", "d", "e"]
+    assert cache.stats()["evictions"] == 2
+
+    # and a, d and e are served from the cache
+    computed.clear()
+    for key in ("a", "d", "e"):
+        get(cache, computed, 1, key)
+    assert computed == []
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["hits"], stats["misses"]) == (3, 3 * SIZE, 4, 5)
+
+# ------------------------------------------------------------------
+# compute_ahead on a pool
+# ------------------------------------------------------------------
+
+def page_jobs(data, spec):
+    # Every page's jobs for one spec, as app.py lists them, plus the other groupings
+    # and grains the pages offer
+    jobs = [job for name, filtered in PAGES.items() for job in load_page(name).jobs(*((data, spec) if filtered else (data,)))]
+    return jobs + [
+        (product_summary, data, spec, "type"),
+        (revenue_trend, data, spec, "week"),
+        (monthly_breakdown, data, spec, "type"),
+        (cumulative_series, data, spec, "units_sold"),
+        (cashflow_series, data, spec, "product_name"),
+    ]
+
+@pytest.mark.filterwarnings("ignore:invalid value encountered:RuntimeWarning")
+def test_compute_ahead_on_a_pool_matches_sequential(monkeypatch):
+    f_sales, f_inventory, d_products, d_date = generate(3000, n_days=120, density=0.3, seed=4)
+    d_date = add_calendar_columns(d_date)
+    data = build_dataset(f_sales, f_inventory, d_products, d_date)
+    jobs = [job for spec in specs(d_products, d_date).values() for job in page_jobs(data, spec)]
+    unique = {(job[0],) + job[2:] for job in jobs}
+
+    cache = ResultCache(10**9)
+    monkeypatch.setattr(result_cache, "RESULT_CACHE", cache)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        monkeypatch.setattr(result_cache, "POOL", pool)
+        compute_ahead(jobs + jobs)
+
+    # Each distinct call ran once, on the pool, and the pages' calls are now hits
+    assert cache.stats()["misses"] == len(unique)
+    assert cache.stats()["entries"] == len(unique)
+    for func, _, *args in jobs:
+        assert_same(func(data, *args), func.__wrapped__(data, *args))
+    assert cache.stats()["misses"] == len(unique)
+    assert cache.stats()["hits"] == len(jobs)
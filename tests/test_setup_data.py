@@ -0,0 +1,197 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from utils.setup_data import PARTITION_MANIFEST, frame_batches, partition_keys, update_fact_partitions
+
+# update_fact_partitions against a scratch data/ folder: which months it writes, how it
+# counts them, and that the rows on disk always come back as the rows passed in
+
+D_DATE = pd.DataFrame({"date_id": range(1, 61), "date": pd.date_range("2021-01-01", periods=60)})
+
+def facts(*rows):
+    return pd.DataFrame(list(rows), columns=["product_id", "date_id", "quantity_sold"]).astype("int32")
+
+BASE = facts((1, 1, 5), (2, 1, 3), (1, 20, 4), (3, 35, 2), (2, 50, 7))
+
+def update(df):
+    return update_fact_partitions("f_sales", frame_batches(df.groupby(partition_keys(df, D_DATE))))
+
+def folder(month):
+    return os.path.join("data", "f_sales", month)
+
+def segments(month):
+    return sorted(os.listdir(folder(month)))
+
+def stored(month):
+    rows = pd.concat([pd.read_csv(os.path.join(folder(month), f)) for f in segments(month)], ignore_index=True)
+    return sorted(map(tuple, rows.to_numpy().tolist()))
+
+def expected(df, month):
+    return sorted(map(tuple, df[partition_keys(df, D_DATE) == month].to_numpy().tolist()))
+
+def written_files():
+    # Every file under data/f_sales/ with its mtime
+    return {
+        os.path.join(root, f): os.stat(os.path.join(root, f)).st_mtime_ns
+        for root, _, files in os.walk(os.path.join("data", "f_sales"))
+        for f in files
+    }
+
+def counts(stats):
+    return {key: value for key, value in stats.items() if value}
+
+def test_fresh_load(data_dir):
+    stats = update(BASE)
+    assert counts(stats) == {"new": 2, "rows_written": 5}
+    for month in ("2021-01", "2021-02"):
+        assert segments(month) == ["part-00000.csv"]
+        assert stored(month) == expected(BASE, month)
+    with open(os.path.join("data", "f_sales", PARTITION_MANIFEST)) as f:
+        assert sorted(json.load(f)) == ["2021-01", "2021-02"]
+
+def test_unchanged_rerun_writes_nothing(data_dir):
+    update(BASE)
+    before = written_files()
+    stats = update(BASE)
+    assert counts(stats) == {"unchanged": 2}
+    assert written_files() == before
+
+def test_rows_added_to_a_month_go_to_a_new_segment(data_dir):
+    update(BASE)
+    more = pd.concat([BASE, facts((4, 10, 1))], ignore_index=True)
+    stats = update(more)
+    assert counts(stats) == {"appended": 1, "unchanged": 1, "rows_written": 1}
+    assert segments("2021-01") == ["part-00000.csv", "part-00001.csv"]
+    assert stored("2021-01") == expected(more, "2021-01")
+
+def test_changed_row_rewrites_its_month(data_dir):
+    update(BASE)
+    changed = BASE.assign(quantity_sold=BASE["quantity_sold"].mask(BASE["date_id"] == 20, 9))
+    stats = update(changed)
+    assert counts(stats) == {"rewritten": 1, "unchanged": 1, "rows_written": 3}
+    assert segments("2021-01") == ["part-00000.csv"]
+    assert stored("2021-01") == expected(changed, "2021-01")
+
+def test_month_without_rows_is_removed(data_dir):
+    update(BASE)
+    january = BASE[BASE["date_id"] <= 31]
+    stats = update(january)
+    assert counts(stats) == {"unchanged": 1, "removed": 1}
+    assert not os.path.exists(folder("2021-02"))
+
+def test_segment_missing_from_the_manifest_is_kept(data_dir):
+    # A run that wrote part-00001.csv and stopped before saving the manifest
+    update(BASE)
+    with open(os.path.join("data", "f_sales", PARTITION_MANIFEST)) as f:
+        manifest = f.read()
+    written = pd.concat([BASE, facts((4, 10, 1))], ignore_index=True)
+    update(written)
+    with open(os.path.join("data", "f_sales", PARTITION_MANIFEST), "w") as f:
+        f.write(manifest)
+
+    # The next run numbers its segment after the one on disk instead of overwriting it
+    more = pd.concat([written, facts((5, 11, 2))], ignore_index=True)
+    stats = update(more)
+    assert counts(stats) == {"appended": 1, "unchanged": 1, "rows_written": 1}
+    assert segments("2021-01") == ["part-00000.csv", "part-00001.csv", "part-00002.csv"]
+    assert stored("2021-01") == expected(more, "2021-01")
+
+def test_exact_duplicates_are_counted(data_dir):
+    update(BASE)
+    copies = pd.concat([BASE, BASE.iloc[[0]], BASE.iloc[[0]]], ignore_index=True)
+    stats = update(copies)
+    assert counts(stats) == {"appended": 1, "unchanged": 1, "rows_written": 2}
+    assert stored("2021-01") == expected(copies, "2021-01")
+
+    # One copy fewer is a removed row, so the month is rewritten
+    fewer = copies.drop(index=len(copies) - 1)
+    stats = update(fewer)
+    assert counts(stats) == {"rewritten": 1, "unchanged": 1, "rows_written": 4}
+    assert stored("2021-01") == expected(fewer, "2021-01")
+
+@pytest.mark.parametrize("budget", [1, 10**6])
+def test_batches_and_budget_do_not_change_the_result(data_dir, budget):
+    # Months handed over in small batches, with stored rows read back a chunk at a time
+    def batched(df):
+        for month, rows in df.groupby(partition_keys(df, D_DATE)):
+            yield month, lambda rows=rows: [rows.iloc[i:i + 2] for i in range(0, len(rows), 2)]
+
+    update_fact_partitions("f_sales", batched(BASE), budget)
+    more = pd.concat([BASE, BASE.iloc[[2]], facts((6, 40, 3))], ignore_index=True)
+    stats = update_fact_partitions("f_sales", batched(more), budget)
+    assert counts(stats) == {"appended": 2, "rows_written": 2}
+    for month in ("2021-01", "2021-02"):
+        assert stored(month) == expected(more, month)
+
+# ------------------------------------------------------------------
+# Streaming workbook load
+# ------------------------------------------------------------------
+
+def write_workbook(path):
+    # A small workbook with the quirks the loads have to handle alike: blank rows,
+    # duplicate dimension and fact rows, and a fact dated outside d_date
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("d_products")
+    sheet.append(["product_id", "product_name", "type", "unit_cost_usd", "unit_retail_price_usd"])
+    for i in range(1, 6):
+        sheet.append([i, f"product {i}", "food" if i % 2 else "non-food", 1.5 * i, 2.5 * i])
+    sheet.append([2, "product 2", "non-food", 3.0, 5.0])
+    sheet = workbook.create_sheet("d_date")
+    sheet.append(["date_id", "date", "is_holiday"])
+    for date_id, date in zip(D_DATE["date_id"], D_DATE["date"]):
+        sheet.append([date_id, date.to_pydatetime(), int(date_id % 9 == 0)])
+    for name, quantity in (("f_sales", "quantity_sold"), ("f_inventory", "quantity_purchased")):
+        sheet = workbook.create_sheet(name)
+        sheet.append(["date_id", "product_id", quantity])
+        for i in range(40):
+            sheet.append([1 + (i * 7) % 60, 1 + i % 5, 1 + i % 4])
+            if i % 13 == 0:
+                sheet.append([None, None, None])
+        sheet.append([1, 1, 1])
+        sheet.append([1, 1, 1])
+        sheet.append([99, 3, 2])
+    workbook.save(path)
+
+def loaded_files():
+    # Dimension CSVs as text, and each fact month's rows and manifest entry
+    out = {}
+    for name in ("d_products", "d_date"):
+        with open(os.path.join("data", f"{name}.csv")) as f:
+            out[name] = f.read()
+    for name in ("f_sales", "f_inventory"):
+        root = os.path.join("data", name)
+        with open(os.path.join(root, PARTITION_MANIFEST)) as f:
+            manifest = json.load(f)
+        for month in sorted(os.listdir(root)):
+            if month == PARTITION_MANIFEST:
+                continue
+            rows = pd.concat([pd.read_csv(os.path.join(root, month, f)) for f in sorted(os.listdir(os.path.join(root, month)))])
+            out[f"{name}/{month}"] = (
+                sorted(map(tuple, rows.to_numpy().tolist())),
+                {key: manifest[month][key] for key in ("rows", "checksum")},
+            )
+    return out
+
+@pytest.mark.parametrize("budget", [1, 2000])
+def test_streaming_load_matches_whole_sheet_load(data_dir, monkeypatch, budget):
+    # A budget of 1 byte reads one row per chunk, 2000 bytes six rows
+    import utils.setup_data as setup_data
+
+    write_workbook(data_dir / "source.xlsx")
+    monkeypatch.setattr(setup_data, "SOURCE_WORKBOOK", str(data_dir / "source.xlsx"))
+    setup_data.load_workbook()
+    whole = loaded_files()
+    for name in ("d_products", "d_date", "f_sales", "f_inventory"):
+        path = data_dir / name
+        shutil.rmtree(path) if path.is_dir() else os.remove(f"{path}.csv")
+
+    setup_data.stream_workbook(budget)
+    assert loaded_files() == whole
+    assert "f_sales/undated" in whole
+    assert not os.path.exists(data_dir / ".staging" / "f_sales")
@@ -0,0 +1,311 @@
+import itertools
+import threading
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from utils.calendar import date_labels
+from utils.cube import GRAINS, PREFIX, append_to_cube, build_cube, filter_cube, query_cube, range_totals
+from utils.data_loader import fill_gaps, merge_dimensions
+from utils.kpi_helpers import cashflow_ratio, profit_pct
+from utils.profiling import profile_stage
+from utils.read_only import fingerprint, freeze
+from utils.result_cache import cached_result
+
+# d_date column holding the bucket start for each cube grain
+PERIOD_COLUMNS = {"day": "date", "week": "week_start", "month": "month_start"}
+
+# Parts of a dataset every session reads, which nothing may change
+SHARED = ("cube", "products", "dates")
+
+# Numbers every dataset in the order it is built, for the result cache
+GENERATIONS = itertools.count()
+
+# ------------------------------------------------------------------
+# Dataset and filter spec
+# ------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class FilterSpec:
+    # Sidebar selection in normalized form, so equal selections compare and hash equal
+    products: tuple
+    start_date: pd.Timestamp
+    end_date: pd.Timestamp
+
+def filter_spec(products, start_date, end_date):
+    return FilterSpec(
+        tuple(sorted(set(products))),
+        pd.Timestamp(start_date).normalize(),
+        pd.Timestamp(end_date).normalize(),
+    )
+
+def build_dataset(f_sales, f_inventory, d_products, d_date, version=None):
+    # Everything the analytics need: the rollup cube and the two dimensions. version
+    # labels the data, so pass data_version() for data read from disk; without one the
+    # dataset gets a version of its own. Cached results are kept for the newest dataset
+    # built (see ResultCache). One dataset is shared by every session, so it is frozen:
+    # analytics and pages derive new frames from it, and check_dataset() tells when
+    # something changed it anyway.
+    with profile_stage("merge", len(f_sales) + len(f_inventory)) as stage:
+        sales_df, inventory_df = merge_dimensions(f_sales, f_inventory, d_products, d_date)
+        stage["rows_out"] = len(sales_df) + len(inventory_df)
+    with profile_stage("cube", stage["rows_out"]) as stage:
+        cube = build_cube(sales_df, inventory_df)
+        stage["rows_out"] = sum(len(cube[grain]) for grain in GRAINS)
+    return shared_dataset(cube, d_products, d_date, version)
+
+def append_facts(data, f_sales, f_inventory, version=None):
+    # data with more fact rows: f_sales and f_inventory hold only the new rows, cleaned
+    # as load_data would (see data_loader.read_appended). Only the cube buckets they fall
+    # in are summed again, so grouping costs follow the new rows rather than all history.
+    # The dimensions stay as they are; when they change, use build_dataset.
+    with profile_stage("merge", len(f_sales) + len(f_inventory)) as stage:
+        sales_df, inventory_df = merge_dimensions(f_sales, f_inventory, data["products"], data["dates"])
+        stage["rows_out"] = len(sales_df) + len(inventory_df)
+    with profile_stage("cube append", stage["rows_out"]) as stage:
+        cube = append_to_cube(data["cube"], sales_df, inventory_df)
+        stage["rows_out"] = sum(len(cube[grain]) for grain in GRAINS)
+    return shared_dataset(cube, data["products"], data["dates"], version)
+
+def shared_dataset(cube, d_products, d_date, version):
+    # The dataset around a cube and its dimensions, frozen and fingerprinted
+    shared = freeze({"cube": cube, "products": d_products, "dates": d_date})
+    return {
+        **shared,
+        "version": version or uuid.uuid4().hex,
+        "generation": next(GENERATIONS),
+        "selection": threading.local(),
+        "fingerprint": fingerprint(shared),
+    }
+
+def check_dataset(data, where):
+    # Raise if a frame of the shared dataset gained, lost or swapped a column since it
+    # was built; writes into its arrays already raise where they happen
+    if fingerprint({key: data[key] for key in SHARED}) != data["fingerprint"]:
+        raise RuntimeError(f"{where} modified the shared dataset; derive a new frame instead")
+
+def select(data, spec):
+    # Cube view plus the selected dimension rows for a spec. The latest selection of each
+    # thread is kept on the dataset, so all the analytics of one rerun share a single
+    # lookup without sessions running at the same time trading it back and forth.
+    memo = data["selection"]
+    cached = getattr(memo, "latest", None)
+    if cached is not None and cached[0] == spec:
+        return cached[1]
+
+    cube = data["cube"]
+    with profile_stage("filter", sum(len(cube[grain]) for grain in GRAINS)) as stage:
+        products = data["products"][data["products"]["product_name"].isin(spec.products)]
+        dates = data["dates"][data["dates"]["date"].between(spec.start_date, spec.end_date)]
+        view = filter_cube(cube, products, dates)
+        stage["rows_out"] = sum(len(view[grain]) for grain in GRAINS)
+    selection = (view, products, dates)
+    memo.latest = (spec, selection)
+    return selection
+
+def selected_rows(data, spec=None):
+    # Day rows of the cube an analysis reads, appended ones included: those selected by
+    # spec, or all of them
+    cube = data["cube"] if spec is None else select(data, spec)[0]
+    return len(cube["day"]) + (0 if cube["delta"] is None else len(cube["delta"]["day"]))
+
+# ------------------------------------------------------------------
+# Sales vs. inventory by product or type
+# ------------------------------------------------------------------
+
+@cached_result
+def product_summary(data, spec, group_col):
+    # Revenue, inventory cost and realized profit per group_col ("product_name" or "type"),
+    # largest sellers first, plus the KPI totals over all groups
+    _, products, dates = select(data, spec)
+    value_cols = ["sales_revenue", "inventory_cost", "realized_cost"]
+    totals = range_totals(data["cube"], products, dates)
+    totals = totals.groupby(group_col, observed=True)[value_cols].sum().reset_index()
+
+    totals["realized_profit"] = totals["sales_revenue"] - totals["realized_cost"]
+    totals["profit_pct"] = profit_pct(totals["realized_profit"], totals["realized_cost"])
+
+    total_sales = totals["sales_revenue"].sum()
+    total_realized_cost = totals["realized_cost"].sum()
+    total_profit = total_sales - total_realized_cost
+    kpis = {
+        "sales_revenue": total_sales,
+        "inventory_cost": totals["inventory_cost"].sum(),
+        "realized_profit": total_profit,
+        "profit_pct": profit_pct(total_profit, total_realized_cost),
+    }
+    return totals.sort_values(by="sales_revenue", ascending=False), kpis
+
+# ------------------------------------------------------------------
+# Revenue trend
+# ------------------------------------------------------------------
+
+@cached_result
+def revenue_trend(data, spec, grain):
+    # Revenue and inventory cost per day, week or month
+    view, products, dates = select(data, spec)
+    value_cols = ["sales_revenue", "inventory_cost"]
+    periods = dates.assign(period=dates[PERIOD_COLUMNS[grain]])
+    trend = query_cube(view, dates, ["period"], grain)[["period"] + value_cols]
+    return fill_gaps(trend, value_cols, products, periods)
+
+# ------------------------------------------------------------------
+# Monthly breakdown
+# ------------------------------------------------------------------
+
+def month_label(df):
+    # Display label for the month_start bucket, formatted only on aggregated rows
+    return date_labels(df["month_start"], "%B %Y")
+
+@cached_result
+def monthly_breakdown(data, spec, group_col):
+    # Monthly revenue and inventory cost by group_col for the chart, and the
+    # overall, per-type and per-product summaries (latest month first)
+    view, products, dates = select(data, spec)
+    value_cols = ["sales_revenue", "inventory_cost"]
+    monthly = query_cube(view, dates, ["product_name", "type", "period"], "month")
+    monthly = monthly.rename(columns={"period": "month_start"})
+
+    def summarize(rows, keys, scope):
+        summary = rows.groupby(keys, observed=True)[value_cols].sum().reset_index()
+        summary = fill_gaps(summary, value_cols, scope, dates)
+        summary["month"] = month_label(summary)
+        return summary
+
+    def add_profit(summary):
+        summary["profit"] = summary["sales_revenue"] - summary["inventory_cost"]
+        summary["profit_pct"] = profit_pct(summary["profit"], summary["sales_revenue"])
+        return summary
+
+    chart = summarize(monthly, [group_col, "month_start"], products)
+
+    overall = add_profit(summarize(monthly, "month_start", products))
+    overall = overall.sort_values("month_start", ascending=False)
+
+    by_type = add_profit(summarize(monthly, ["type", "month_start"], products))
+    by_type = by_type.sort_values(["type", "month_start"], ascending=[True, False])
+
+    by_product = {}
+    for t in by_type["type"].dropna().unique():
+        type_products = products[products["type"] == t]
+        if type_products.empty:
+            continue
+        combined = add_profit(summarize(monthly[monthly["type"] == t], ["product_name", "month_start"], type_products))
+        by_product[t] = combined.sort_values(["product_name", "month_start"], ascending=[True, False])
+
+    return {"chart": chart, "overall": overall, "by_type": by_type, "by_product": by_product}
+
+# ------------------------------------------------------------------
+# Food / non-food by holiday period
+# ------------------------------------------------------------------
+
+@cached_result
+def holiday_kpis(data):
+    # Revenue over all products and dates, split by food vs. non-food and holiday flag
+    totals = query_cube(data["cube"], None, ["type", "is_holiday"])
+    food = totals["type"] == "food"
+    revenue = totals["sales_revenue"]
+    return {
+        "food_nonholiday": revenue[food & (totals["is_holiday"] == 0)].sum(),
+        "food_holiday": revenue[food & (totals["is_holiday"] == 1)].sum(),
+        "nonfood_nonholiday": revenue[~food & (totals["is_holiday"] == 0)].sum(),
+        "nonfood_holiday": revenue[~food & (totals["is_holiday"] == 1)].sum(),
+    }
+
+# ------------------------------------------------------------------
+# Products above a revenue threshold
+# ------------------------------------------------------------------
+
+@cached_result
+def product_ranking(data, spec):
+    # Revenue, units, realized profit and profit % per product; empty when nothing is selected
+    _, products, dates = select(data, spec)
+    value_cols = ["sales_revenue", "units_sold", "realized_cost"]
+    ranking = range_totals(data["cube"], products, dates)
+    ranking = ranking.sort_values("product_name", ignore_index=True)[["product_name"] + value_cols]
+
+    ranking["realized_profit"] = ranking["sales_revenue"] - ranking["realized_cost"]
+    ranking["profit_pct"] = profit_pct(ranking["realized_profit"], ranking["realized_cost"])
+    return ranking
+
+def above_threshold(ranking, threshold):
+    # Products selling more than threshold, largest first
+    return ranking[ranking["sales_revenue"] > threshold].sort_values(by="sales_revenue", ascending=False)
+
+# ------------------------------------------------------------------
+# Cumulative sales
+# ------------------------------------------------------------------
+
+@cached_result
+def cumulative_series(data, spec, measure):
+    # Daily value and running total of measure ("sales_revenue" or "units_sold") per product
+    # over the range. The running total is sliced from the cube: each day's running total
+    # since the start of history, less its value on the day before the range starts. Rows
+    # appended to the cube carry running totals of their own, sliced alike and added.
+    view, products, dates = select(data, spec)
+    parts = [view["day"]] + ([] if view["delta"] is None else [view["delta"]["day"]])
+    rows = pd.concat([p[["product_name", "period", measure]] for p in parts], ignore_index=True)
+    if len(parts) > 1:
+        rows = rows.groupby(["product_name", "period"], observed=True)[measure].sum().reset_index()
+    daily = fill_gaps(rows.rename(columns={"period": "date"}), [measure], products, dates)
+
+    # Days without a row keep the running total of the day before
+    cumulative = np.zeros(len(daily), dtype=daily[measure].dtype)
+    for part in parts:
+        sliced = daily[["product_name", "date"]].merge(sliced_running(part, measure), on=["product_name", "date"], how="left")
+        cumulative = cumulative + sliced.groupby("product_name", observed=True)["cumulative"].ffill().fillna(0).to_numpy()
+    daily["cumulative"] = cumulative.astype(daily[measure].dtype)
+    return daily
+
+def sliced_running(day, measure):
+    # Running total of measure on each row of a cube's day grain, counted from the first
+    # row of each product in it; filter_cube starts the day grain at the range's first day
+    running = PREFIX + measure
+    rows = day.rename(columns={"period": "date"})[["product_name", "date", measure, running]]
+    first = rows.groupby("product_name", observed=True)[[measure, running]].transform("first")
+    rows = rows.assign(cumulative=rows[running] - (first[running] - first[measure]))
+    return rows[["product_name", "date", "cumulative"]]
+
+# ------------------------------------------------------------------
+# Weekly cashflow ratio
+# ------------------------------------------------------------------
+
+@cached_result
+def cashflow_series(data, spec, group_col=None):
+    # Weekly revenue, inventory cost and cashflow ratio, optionally per group_col
+    view, products, dates = select(data, spec)
+    value_cols = ["sales_revenue", "inventory_cost"]
+    group_cols = ([group_col] if group_col else []) + ["week"]
+    weeks = dates.assign(week=dates["week_start"])
+
+    # The cube calls the week "period"
+    cashflow = (
+        query_cube(view, dates, group_cols[:-1] + ["period"], "week")
+        .rename(columns={"period": "week"})[group_cols + value_cols]
+    )
+    cashflow = fill_gaps(cashflow, value_cols, products, weeks)
+    cashflow["cashflow_ratio"] = cashflow_ratio(cashflow["sales_revenue"], cashflow["inventory_cost"])
+    return cashflow
+
+def cashflow_kpis(cashflow):
+    # Totals over an ungrouped cashflow series, with the change from the previous
+    # week to the latest one (None when there are fewer than two weeks)
+    weekly = cashflow.sort_values(by="week")
+    total_sales = weekly["sales_revenue"].sum()
+    total_cost = weekly["inventory_cost"].sum()
+    kpis = {
+        "sales_revenue": total_sales,
+        "inventory_cost": total_cost,
+        "cashflow_ratio": cashflow_ratio(total_sales, total_cost),
+        "delta_sales": None,
+        "delta_cost": None,
+        "delta_ratio": None,
+    }
+    if len(weekly) >= 2:
+        current, previous = weekly.iloc[-1], weekly.iloc[-2]
+        kpis["delta_sales"] = current["sales_revenue"] - previous["sales_revenue"]
+        kpis["delta_cost"] = current["inventory_cost"] - previous["inventory_cost"]
+        kpis["delta_ratio"] = current["cashflow_ratio"] - previous["cashflow_ratio"]
+    return kpis
@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from config import BENCHMARK_BASELINE, BENCHMARK_TOLERANCE, CACHE_DIR
+from utils.analytics import (
+    append_facts,
+    build_dataset,
+    cashflow_kpis,
+    cashflow_series,
+    cumulative_series,
+    filter_spec,
+    holiday_kpis,
+    monthly_breakdown,
+    product_ranking,
+    product_summary,
+    revenue_trend,
+    select,
+)
+from utils.chart_helpers import downsample
+from utils.data_loader import load_data, merge_dimensions
+from utils.result_cache import POOL, RESULT_CACHE, compute_ahead
+from utils.synthetic_data import generate, write_tables
+
+# Wall time and peak memory of the app's cold start, and of the data pipeline and every
+# page's computation on synthetic data at one or more scales, checked against a stored
+# baseline. Run from the repo root: python -m utils.benchmark --rows 1e4 1e5 1e6 [--save-baseline]
+# Exits with status 1 when a stage got slower or bigger than the baseline allows.
+
+# What each page computes with its widgets at their defaults
+PAGE_WORKLOADS = {
+    "sales_inventory_page": lambda data, spec: product_summary(data, spec, "product_name"),
+    "revenue_trend": lambda data, spec: downsample(
+        revenue_trend(data, spec, "day").melt(id_vars="period", value_vars=["sales_revenue", "inventory_cost"]),
+        "period", "value", "variable",
+    ),
+    "monthly_breakdown": lambda data, spec: monthly_breakdown(data, spec, "product_name"),
+    "food_nonholiday": lambda data, spec: holiday_kpis(data),
+    "product_threshold": lambda data, spec: product_ranking(data, spec),
+    "cumulative_sales": lambda data, spec: downsample(
+        cumulative_series(data, spec, "sales_revenue"), "date", "cumulative", "product_name",
+    ),
+    "cashflow_ratio": lambda data, spec: cashflow_kpis(cashflow_series(data, spec, None)),
+}
+
+# Cold start in a fresh interpreter: importing Streamlit (done by the server before any
+# script runs), then the app's first run with its own imports and data load, and a rerun.
+# Within the first run, the time until the sidebar and until the first section have
+# rendered are read off the profiler's records of those stages. The test harness is
+# warmed up on an empty script first, so its own start-up is left out.
+STARTUP_SCRIPT = """
+import json, resource, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+AppTest.from_string("import streamlit as st").run()
+app = AppTest.from_file({app!r}, default_timeout=600)
+first_started, first_clock = time.perf_counter(), time.time()
+app.run()
+first_run = time.perf_counter()
+from utils.profiling import RECORDS
+rendered = lambda stage: next(r["finished"] for r in RECORDS if r["stage"].startswith(stage)) - first_clock
+marks = {{"to sidebar": rendered("sidebar"), "to first section": rendered("page ")}}
+app.run()
+print(json.dumps({{
+    "streamlit import": imported - started,
+    **marks,
+    "first run": first_run - first_started,
+    "rerun": time.perf_counter() - first_run,
+    "peak_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    "failed": bool(app.exception),
+}}))
+"""
+
+# Differences below these are noise, whatever the tolerance says
+MIN_SECONDS = 0.05
+MIN_BYTES = 1024 * 1024
+
+def measure(repeat, reset, func, *args):
+    # Result, best wall time and largest peak of memory allocated above the starting
+    # point over repeat calls, with reset() undoing any caching before each of them.
+    # Memory is what tracemalloc sees: Python objects and numpy buffers, not Arrow's.
+    seconds, peak_bytes = [], []
+    for _ in range(repeat):
+        reset()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        result = func(*args)
+        seconds.append(time.perf_counter() - started)
+        peak_bytes.append(tracemalloc.get_traced_memory()[1] - start_bytes)
+    return result, {"seconds": min(seconds), "peak_bytes": max(peak_bytes)}
+
+def run_startup(repeat):
+    # Best cold start over repeat fresh interpreters, run on the app and data in this folder
+    code = STARTUP_SCRIPT.format(app=os.path.abspath("app.py"))
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        if run["failed"]:
+            raise RuntimeError("The app raised an exception on its first run")
+        runs.append(run)
+    return {
+        f"startup {stage}": {
+            "seconds": min(run[stage] for run in runs),
+            "peak_bytes": max(run["peak_bytes"] for run in runs) if stage == "first run" else 0,
+        }
+        for stage in ("streamlit import", "to sidebar", "to first section", "first run", "rerun")
+    }
+
+def run_scale(rows, seed, repeat):
+    # Every stage at one scale, on tables written to a scratch data/ folder
+    workdir = tempfile.mkdtemp(prefix="benchmark_")
+    cwd = os.getcwd()
+    results = {}
+    keep = lambda: None
+    try:
+        write_tables(generate(rows, seed=seed), os.path.join(workdir, "data"))
+        os.chdir(workdir)
+
+        drop_cache = lambda: shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        _, results["load (csv)"] = measure(repeat, keep, load_data, False)
+        _, results["load (cache cold)"] = measure(repeat, drop_cache, load_data)
+        tables, results["load (cache warm)"] = measure(repeat, keep, load_data)
+        _, results["merge"] = measure(repeat, keep, merge_dimensions, *tables)
+        data, results["dataset"] = measure(repeat, keep, build_dataset, *tables)
+
+        # The app's first view: every product over all dates
+        spec = filter_spec(tables[2]["product_name"], tables[3]["date"].min(), tables[3]["date"].max())
+        _, results["filter"] = measure(repeat, lambda: setattr(data["selection"], "latest", None), select, data, spec)
+        for page, workload in PAGE_WORKLOADS.items():
+            _, results[f"page {page}"] = measure(repeat, RESULT_CACHE.clear_entries, workload, data, spec)
+
+        # All pages at once on the PAGE_WORKERS pool, as a full rerun computes them, when
+        # there is one
+        if POOL is not None:
+            jobs = [(workload, data, spec) for workload in PAGE_WORKLOADS.values()]
+            _, results["pages (compute ahead)"] = measure(repeat, RESULT_CACHE.clear_entries, compute_ahead, jobs)
+
+        # The last day's facts added to a dataset of the days before, as a refresh does
+        # when the only new data is another day of fact segments. Last, since the result
+        # cache keeps the results of the newest dataset only.
+        last = tables[3]["date_id"].max()
+        earlier = build_dataset(*[df[df["date_id"] < last] for df in tables[:2]], *tables[2:])
+        latest = [df[df["date_id"] == last] for df in tables[:2]]
+        _, results["dataset (append a day)"] = measure(repeat, keep, append_facts, earlier, *latest)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def regressions(results, baseline, tolerance):
+    # Stages slower or bigger than their baseline by more than tolerance and the noise floor
+    found = []
+    for scale, stages in results.items():
+        for stage, now in stages.items():
+            before = baseline.get(scale, {}).get(stage)
+            if before is None:
+                continue
+            for metric, floor in (("seconds", MIN_SECONDS), ("peak_bytes", MIN_BYTES)):
+                if now[metric] > before[metric] * (1 + tolerance) and now[metric] - before[metric] > floor:
+                    label = scale if scale == "startup" else f"{scale} rows"
+                    found.append(f"{label}, {stage}: {metric} {before[metric]:,.3f} -> {now[metric]:,.3f}")
+    return found
+
+def print_results(results, baseline):
+    for scale, stages in results.items():
+        print(f"\n{scale}" if scale == "startup" else f"\n{scale} sales rows")
+        print(f"  {'stage':<32}{'seconds':>10}{'peak MB':>10}{'vs baseline':>14}")
+        for stage, now in stages.items():
+            before = baseline.get(scale, {}).get(stage)
+            change = f"{now['seconds'] / before['seconds'] - 1:+.0%}" if before and before["seconds"] else ""
+            print(f"  {stage:<32}{now['seconds']:>10.3f}{now['peak_bytes'] / 2**20:>10.1f}{change:>14}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the data pipeline and every page on synthetic data")
+    parser.add_argument(
+        "--rows", nargs="*", type=lambda v: int(float(v)), default=[10_000, 100_000, 1_000_000],
+        help="sales rows per scale, e.g. 1e6; none to time the cold start only",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the fastest counts")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=BENCHMARK_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        baseline = {}
+
+    results = {"startup": run_startup(args.repeat)}
+    tracemalloc.start()
+    results.update({str(rows): run_scale(rows, args.seed, args.repeat) for rows in args.rows})
+    tracemalloc.stop()
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({**baseline, **results}, f, indent=2)
+        print(f"\n✅ Baseline saved to {args.baseline}")
+        return
+
+    found = regressions(results, baseline, args.tolerance)
+    if found:
+        print("\n❌ Regressions against the baseline:")
+        for line in found:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\n✅ No regressions" if baseline else "\nNo baseline yet; run with --save-baseline to store one")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from config import FISCAL_YEAR_START_MONTH
+
+def add_calendar_columns(d_date):
+    # Bucket keys for every calendar day, computed once at load time so pages
+    # group on plain columns instead of converting dates row by row
+    date = d_date["date"]
+    year = date.dt.year
+    month = date.dt.month
+    fiscal_month = (month - FISCAL_YEAR_START_MONTH) % 12
+
+    return d_date.assign(
+        # Weeks start on Monday, like to_period("W")
+        week_start=date - pd.to_timedelta(date.dt.dayofweek, unit="D"),
+        month_start=date.values.astype("datetime64[M]").astype(date.dtype),
+        month_key=year * 100 + month,
+        fiscal_year=year + ((FISCAL_YEAR_START_MONTH > 1) & (month >= FISCAL_YEAR_START_MONTH)).astype(year.dtype),
+        fiscal_quarter=fiscal_month // 3 + 1,
+    )
+
+def date_labels(dates, fmt):
+    # dates formatted with strftime's fmt, formatting each distinct date once rather than
+    # every row: aggregated frames repeat the same few weeks or months per product
+    codes, uniques = pd.factorize(dates, use_na_sentinel=False)
+    return pd.Series(uniques.strftime(fmt).to_numpy()[codes], index=dates.index, name=dates.name)
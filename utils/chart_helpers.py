@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from config import CHART_MAX_POINTS
+
+def downsample(df, x, y, group=None, max_points=CHART_MAX_POINTS):
+    # Rows of df to draw, at most about max_points per trace (one trace per value of
+    # group, or one in all). Each trace's rows, which must come in x order, are cut into
+    # equal buckets and only the lowest and highest y of each bucket are kept, with the
+    # trace's first and last row, so peaks, dips and the overall shape survive.
+    # Traces within the budget are kept whole; rows come back in their original order.
+    if df.empty:
+        return df
+    trace = pd.factorize(df[group])[0] if group else np.zeros(len(df), dtype=np.int64)
+    points = pd.DataFrame({"trace": trace, "y": df[y].to_numpy()})
+    size = points.groupby("trace")["y"].transform("size").to_numpy()
+    position = points.groupby("trace").cumcount().to_numpy()
+    if size.max() <= max_points:
+        return df
+
+    buckets = max(1, (max_points - 2) // 2)
+    points["bucket"] = position * buckets // size
+    extremes = points.groupby(["trace", "bucket"])["y"]
+    keep = (size <= max_points) | (position == 0) | (position == size - 1)
+    keep[extremes.idxmin().to_numpy()] = True
+    keep[extremes.idxmax().to_numpy()] = True
+    return df[keep]
+
+def point_caption(shown, total):
+    # Note under a chart drawn from fewer points than its data has
+    return f"Showing {shown:,} of {total:,} points (lowest and highest per interval). Turn on 'Show all points' to draw every one."
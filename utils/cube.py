@@ -0,0 +1,308 @@
+import numpy as np
+import pandas as pd
+
+from config import APPEND_COMPACT_SHARE
+
+# Measures carried at every grain of the cube; unit counts stay integers
+MEASURE_DTYPES = {
+    "sales_revenue": "float64",
+    "realized_cost": "float64",
+    "units_sold": "int64",
+    "inventory_cost": "float64",
+    "units_purchased": "int64",
+}
+MEASURES = list(MEASURE_DTYPES)
+KEYS = ["product_name", "type", "is_holiday"]
+
+# Pandas period frequency behind each coarse grain (weeks start on Monday)
+PERIOD_FREQ = {"week": "W", "month": "M"}
+GRAINS = ["day"] + list(PERIOD_FREQ)
+
+# Column prefix of the per-product running totals on the day grain
+PREFIX = "cum_"
+
+def build_cube(sales_df, inventory_df):
+    # Roll both fact tables up to one row per product, holiday flag and day,
+    # then roll the days up to weeks and months on the calendar columns of d_date
+    return cube_from_days(day_rows(sales_df, inventory_df))
+
+def cube_from_days(day):
+    # The cube over rows from day_rows(). "delta" holds the rows appended since, if any,
+    # as a cube of its own (see append_to_cube).
+    cube = {"day": day, "delta": None}
+    for grain in PERIOD_FREQ:
+        cube[grain] = rollup(day, grain)
+
+    # Sort every grain by (product code, period) and key each row by both, so a filter
+    # resolves to row ranges with a binary search instead of a scan
+    cube["products"] = day["product_name"].cat.categories
+    cube["keys"] = {}
+    for grain in GRAINS:
+        frame = cube[grain].sort_values(["product_name", "period"], ignore_index=True)
+        cube[grain] = frame
+        cube["keys"][grain] = row_keys(frame["product_name"].cat.codes, frame["period"])
+
+    # Running totals per product over its days, so the total between two dates is the
+    # difference of two lookups
+    day = cube["day"]
+    running = day.groupby("product_name", observed=True)[MEASURES].cumsum()
+    cube["day"] = day.join(running.add_prefix(PREFIX))
+    return cube
+
+def day_rows(sales_df, inventory_df):
+    # Both fact tables summed per product, holiday flag and day
+    sales = pd.DataFrame({
+        "product_name": sales_df["product_name"],
+        "type": sales_df["type"],
+        "is_holiday": sales_df["is_holiday"],
+        "period": sales_df["date"],
+        "week": sales_df["week_start"],
+        "month": sales_df["month_start"],
+        "sales_revenue": sales_df["quantity_sold"] * sales_df["unit_retail_price_usd"],
+        "realized_cost": sales_df["quantity_sold"] * sales_df["unit_cost_usd"],
+        "units_sold": sales_df["quantity_sold"],
+    })
+    inventory = pd.DataFrame({
+        "product_name": inventory_df["product_name"],
+        "type": inventory_df["type"],
+        "is_holiday": inventory_df["is_holiday"],
+        "period": inventory_df["date"],
+        "week": inventory_df["week_start"],
+        "month": inventory_df["month_start"],
+        "inventory_cost": inventory_df["quantity_purchased"] * inventory_df["unit_cost_usd"],
+        "units_purchased": inventory_df["quantity_purchased"],
+    })
+    facts = pd.concat([sales, inventory], ignore_index=True)
+
+    # Week and month follow from the day, so grouping on them adds no rows
+    return (
+        facts.groupby(KEYS + ["period"] + list(PERIOD_FREQ), observed=True)[MEASURES].sum()
+        .astype(MEASURE_DTYPES)
+        .reset_index()
+    )
+
+def rollup(day, grain):
+    # Day rows summed to week or month buckets
+    return (
+        day.groupby(KEYS + [grain], observed=True)[MEASURES].sum()
+        .reset_index()
+        .rename(columns={grain: "period"})
+    )
+
+def row_keys(codes, periods):
+    # Product code in the high 32 bits, day number in the low 32 bits
+    days = pd.DatetimeIndex(periods).values.astype("datetime64[D]").astype(np.int64) + 2**31
+    return (np.asarray(codes, dtype=np.int64) << 32) + days
+
+def filter_cube(cube, products, dates):
+    # Restrict every grain to the selected products and dates. Rollup rows are kept
+    # from the bucket holding the first date, so query_cube can still tell whole
+    # buckets from partial ones. Rows come back as contiguous slices where possible,
+    # with the appended rows restricted alike in the view's "delta".
+    codes = cube["products"].get_indexer(products["product_name"])
+    codes = np.unique(codes[codes >= 0])
+
+    view = {}
+    for grain in GRAINS:
+        frame = cube[grain]
+        if dates.empty or codes.size == 0:
+            view[grain] = frame.iloc[0:0]
+            continue
+
+        start, end = dates["date"].min(), dates["date"].max()
+        if grain != "day":
+            start = pd.Period(start, PERIOD_FREQ[grain]).start_time
+
+        keys = cube["keys"][grain]
+        lo = np.searchsorted(keys, row_keys(codes, [start] * codes.size), side="left")
+        hi = np.searchsorted(keys, row_keys(codes, [end] * codes.size), side="right")
+        view[grain] = take_ranges(frame, lo, hi)
+    view["delta"] = None if cube["delta"] is None else filter_cube(cube["delta"], products, dates)
+    return view
+
+def take_ranges(frame, lo, hi):
+    # Rows lo[i]:hi[i] for every i, as a plain slice when the ranges join up
+    if (lo[1:] == hi[:-1]).all():
+        return frame.iloc[lo[0]:hi[-1]]
+    return frame.take(range_positions(lo, hi))
+
+def range_positions(lo, hi):
+    # Positions lo[i]..hi[i]-1 for every i, one range after the other
+    lengths = hi - lo
+    return np.arange(lengths.sum()) + np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+
+def query_cube(cube, dates, by, grain="month"):
+    # Totals over the cube (or a view from filter_cube) grouped by `by`, where "period"
+    # is the start of each bucket at `grain`. Buckets that lie wholly inside the date
+    # range are read from the rollup; the partial ones at either end from the days.
+    # Passing None for dates means the whole history. Appended rows add to the totals.
+    parts = query_parts(cube, dates, grain)
+    if cube["delta"] is not None:
+        parts += query_parts(cube["delta"], dates, grain)
+    rows = pd.concat([p[KEYS + ["period"] + MEASURES] for p in parts], ignore_index=True)
+    return rows.groupby(by, observed=True)[MEASURES].sum().reset_index()
+
+def query_parts(cube, dates, grain):
+    # The rows query_cube sums, without those of cube["delta"]
+    rollup = cube[grain]
+    day = cube["day"]
+
+    if dates is None:
+        return [rollup]
+    if dates.empty:
+        return [rollup.iloc[0:0]]
+    start, end = dates["date"].min(), dates["date"].max()
+    if grain == "day":
+        return [rollup[rollup["period"].between(start, end)]]
+    first, last = whole_buckets(start, end, grain)
+    edges = day[day["period"].between(start, end) & ~day[grain].between(first, last)]
+    return [
+        rollup[rollup["period"].between(first, last)],
+        edges.drop(columns="period").rename(columns={grain: "period"}),
+    ]
+
+def range_totals(cube, products, dates):
+    # Totals of every measure per selected product over the date range, read off the
+    # running totals: the value at the last day in range less the value just before
+    # the first, plus the same from the appended rows. Products without facts in range
+    # get zeros; no dates means no rows.
+    rows = products[["product_name", "type"]].reset_index(drop=True)
+    if dates.empty:
+        return rows.iloc[0:0].assign(**{m: pd.Series(dtype=d) for m, d in MEASURE_DTYPES.items()})
+
+    day = cube["day"]
+    keys = cube["keys"]["day"]
+    codes = cube["products"].get_indexer(rows["product_name"])
+    known = codes >= 0
+    codes = np.where(known, codes, 0)
+    start, end = dates["date"].min(), dates["date"].max()
+
+    # Where each product's rows begin, and the rows inside the range
+    first = np.searchsorted(keys, codes.astype(np.int64) << 32, side="left")
+    lo = np.searchsorted(keys, row_keys(codes, [start] * codes.size), side="left")
+    hi = np.searchsorted(keys, row_keys(codes, [end] * codes.size), side="right")
+    hit = known & (hi > lo)
+
+    totals = {}
+    for m, dtype in MEASURE_DTYPES.items():
+        running = day[PREFIX + m].to_numpy()
+        if running.size == 0:
+            totals[m] = np.zeros(len(rows), dtype=dtype)
+            continue
+        before = np.where(lo > first, running[lo - 1], 0)
+        totals[m] = np.where(hit, running[hi - 1] - before, 0).astype(dtype)
+    if cube["delta"] is not None:
+        appended = range_totals(cube["delta"], products, dates)
+        totals = {m: totals[m] + appended[m].to_numpy() for m in MEASURES}
+    return rows.assign(**totals)
+
+def whole_buckets(start, end, grain):
+    # Start of the first and of the last bucket that fit entirely between start and end
+    freq = PERIOD_FREQ[grain]
+    first = pd.Period(start, freq)
+    if first.start_time < start:
+        first += 1
+    last = pd.Period(end, freq)
+    if last.end_time.normalize() > end:
+        last -= 1
+    return first.start_time, last.start_time
+
+def append_to_cube(cube, sales_df, inventory_df, compact_share=APPEND_COMPACT_SHARE):
+    # The cube with more fact rows added, for facts that arrive in batches (a day at a
+    # time, say), merged with the same dimensions the cube was built from. The rows go
+    # into cube["delta"], a cube of the appended rows alone that reads add to the
+    # rest, so an append costs about as much as the rows appended so far rather than
+    # the whole history. Once the delta passes compact_share of the cube's day rows it
+    # is folded in, which copies the cube once.
+    day = day_rows(sales_df, inventory_df)
+    if day.empty:
+        return cube
+    if not day["product_name"].cat.categories.equals(cube["products"]):
+        raise ValueError("New facts name other products than the cube; build the cube again instead")
+
+    delta = cube_from_days(day) if cube["delta"] is None else add_days(cube["delta"], day)
+    if len(delta["day"]) > compact_share * len(cube["day"]):
+        return add_days({**cube, "delta": None}, delta["day"])
+    return {**cube, "delta": delta}
+
+def compact_cube(cube):
+    # The cube with its appended rows folded in, as build_cube would have made it
+    if cube["delta"] is None:
+        return cube
+    return add_days({**cube, "delta": None}, cube["delta"]["day"])
+
+def add_days(cube, day):
+    # A cube without a delta, with rows from day_rows() summed into every grain. Only the
+    # rows of the (product, bucket) pairs they fall in are grouped again, and only the
+    # running totals of their products from their first day on.
+    added = {"products": cube["products"], "keys": {}, "delta": None}
+    for grain in GRAINS:
+        rows = day if grain == "day" else rollup(day, grain)
+        added[grain], added["keys"][grain] = add_rows(cube[grain], cube["keys"][grain], rows)
+    added["day"] = update_running(added["day"], added["keys"]["day"], day)
+    return added
+
+def add_rows(frame, keys, rows):
+    # A grain of the cube (frame, sorted and keyed as build_cube leaves it) with rows
+    # added: the rows of each (product, period) pair in rows are summed with them, and
+    # the result goes back in key order. Running totals of changed rows are left at 0.
+    group_cols = [c for c in frame.columns if c not in MEASURES and not c.startswith(PREFIX)]
+    new_keys = np.unique(row_keys(rows["product_name"].cat.codes, rows["period"]))
+    lo = np.searchsorted(keys, new_keys, side="left")
+    hi = np.searchsorted(keys, new_keys, side="right")
+
+    old = take_ranges(frame, lo, hi)
+    changed = (
+        pd.concat([old[group_cols + MEASURES], rows[group_cols + MEASURES]], ignore_index=True)
+        .groupby(group_cols, observed=True)[MEASURES].sum()
+        .astype(MEASURE_DTYPES)
+        .reset_index()
+        .sort_values(["product_name", "period"], ignore_index=True)
+        .reindex(columns=frame.columns, fill_value=0)
+    )
+
+    # Each side is in key order already, so the stable sort only merges the two runs
+    keep = np.ones(len(frame), dtype=bool)
+    keep[range_positions(lo, hi)] = False
+    merged_keys = np.concatenate([keys[keep], row_keys(changed["product_name"].cat.codes, changed["period"])])
+    order = np.argsort(merged_keys, kind="stable")
+    merged = pd.concat([frame[keep], changed], ignore_index=True).take(order).reset_index(drop=True)
+    return merged, merged_keys[order]
+
+def update_running(day, keys, changed):
+    # day with the running totals of every product in changed recomputed from the
+    # first day it has there: the total just before that day, plus the values since
+    codes = changed["product_name"].cat.codes.to_numpy().astype(np.int64)
+    first_days = changed.groupby(codes)["period"].min()
+    codes = first_days.index.to_numpy()
+    start = np.searchsorted(keys, codes << 32, side="left")
+    lo = np.searchsorted(keys, row_keys(codes, first_days.to_numpy()), side="left")
+    hi = np.searchsorted(keys, (codes + 1) << 32, side="left")
+    positions = range_positions(lo, hi)
+    product = np.repeat(np.arange(len(codes)), hi - lo)
+
+    totals = {}
+    for m, dtype in MEASURE_DTYPES.items():
+        running = day[PREFIX + m].to_numpy(dtype=dtype, copy=True)
+        before = np.where(lo > start, running[lo - 1], 0)
+        since = pd.Series(day[m].to_numpy()[positions]).groupby(product).cumsum().to_numpy()
+        running[positions] = since + np.repeat(before, hi - lo)
+        totals[PREFIX + m] = running
+    return day.assign(**totals)
+
+def cube_differences(cube, expected):
+    # Parts of cube that differ from expected, for checking an appended cube against
+    # one built from all the facts. Sums in another order round differently, so
+    # measures only have to agree to a relative 1e-9.
+    cube, expected = compact_cube(cube), compact_cube(expected)
+    differences = []
+    if not cube["products"].equals(expected["products"]):
+        differences.append("products")
+    for grain in GRAINS:
+        if not np.array_equal(cube["keys"][grain], expected["keys"][grain]):
+            differences.append(f"{grain} keys")
+        try:
+            pd.testing.assert_frame_equal(cube[grain], expected[grain], check_exact=False, rtol=1e-9)
+        except AssertionError:
+            differences.append(grain)
+    return differences
@@ -1,12 +1,258 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
 import pandas as pd
+import pyarrow.feather as feather
+
+from config import APPEND_COMPACT_SHARE, CACHE_DIR, DATA_DIR, FACT_DUPLICATE_POLICY, SOURCE_WORKBOOK
+from utils.calendar import add_calendar_columns
+from utils.profiling import profile_stage
+
+# Explicit schema for every table, so neither the CSV parser nor the cache has to infer it.
+# Keys and quantities are 32-bit integers and names are categorical, so the merged
+# facts carry small codes rather than a Python string per row.
+TABLE_DTYPES = {
+    "f_sales": {"product_id": "int32", "date_id": "int32", "quantity_sold": "int32"},
+    "f_inventory": {"product_id": "int32", "date_id": "int32", "quantity_purchased": "int32"},
+    "d_products": {
+        "product_id": "int32",
+        "product_name": "category",
+        "type": "category",
+        "unit_cost_usd": "float64",
+        "unit_retail_price_usd": "float64",
+    },
+    "d_date": {"date_id": "int32", "date": "datetime64[ns]", "is_holiday": "int8"},
+}
+
+MANIFEST_FILE = "manifest.json"
+
+# Quantity column of each fact table, the one the "sum" duplicate policy adds up
+FACT_QUANTITIES = {"f_sales": "quantity_sold", "f_inventory": "quantity_purchased"}
+DUPLICATE_POLICIES = ("first", "sum", "reject")
 
-def load_data():
-    sales = pd.read_csv("data/f_sales.csv")
-    inventory = pd.read_csv("data/f_inventory.csv")
-    product = pd.read_csv("data/d_products.csv")
-    date = pd.read_csv("data/d_date.csv")
+# Rows read and duplicates dropped per fact table by the latest load_data
+LOAD_REPORT = {}
+
+logger = logging.getLogger(__name__)
+
+def load_data(use_cache=True, duplicate_policy=FACT_DUPLICATE_POLICY):
+    read = read_table_cached if use_cache else read_table_csv
+    with profile_stage("load") as stage:
+        sales = clean_facts("f_sales", read("f_sales"), duplicate_policy)
+        inventory = clean_facts("f_inventory", read("f_inventory"), duplicate_policy)
+        product, date = load_dimensions(use_cache)
+        stage["rows_in"] = sum(r["rows"] for r in LOAD_REPORT.values()) + len(product) + len(date)
+        stage["rows_out"] = len(sales) + len(inventory) + len(product) + len(date)
     return sales, inventory, product, date
 
+def load_dimensions(use_cache=True):
+    # d_products and d_date alone: small, and all the sidebar needs
+    read = read_table_cached if use_cache else read_table_csv
+    return read("d_products"), add_calendar_columns(read("d_date"))
+
+def clean_facts(name, df, policy):
+    # Exact duplicate rows, found by hashing whole rows. "first" keeps one copy of each,
+    # "sum" keeps one copy carrying the quantities of all of them, "reject" raises.
+    # How many rows were dropped goes to LOAD_REPORT and the log.
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy {policy!r}, expected one of {DUPLICATE_POLICIES}")
+
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    duplicated = hashes.duplicated().to_numpy()
+    dropped = int(duplicated.sum())
+    LOAD_REPORT[name] = {"rows": len(df), "dropped": dropped, "policy": policy}
+    if dropped == 0:
+        return df
+    if policy == "reject":
+        raise ValueError(f"{name}: {dropped} duplicate fact rows found")
+    logger.info("%s: %d duplicate rows dropped (policy %s)", name, dropped, policy)
+
+    kept = df[~duplicated].reset_index(drop=True)
+    if policy == "sum":
+        quantity_col = FACT_QUANTITIES[name]
+        copies = hashes[~duplicated].map(hashes.value_counts()).to_numpy()
+        kept[quantity_col] = (kept[quantity_col] * copies).astype(df[quantity_col].dtype)
+    return kept
+
+def table_sources(name):
+    # CSV files behind a table: the segments under data/<name>/ when setup_data has
+    # partitioned it, otherwise the single data/<name>.csv
+    folder = os.path.join(DATA_DIR, name)
+    if os.path.isdir(folder):
+        return sorted(glob.glob(os.path.join(folder, "*", "part-*.csv")))
+    return [os.path.join(DATA_DIR, f"{name}.csv")]
+
+def read_table_csv(name):
+    return combine(name, [read_csv(name, path) for path in table_sources(name)])
+
+def read_csv(name, path):
+    dtypes = TABLE_DTYPES[name]
+    date_cols = [c for c, t in dtypes.items() if t.startswith("datetime")]
+    df = pd.read_csv(
+        path,
+        usecols=list(dtypes),
+        dtype={c: t for c, t in dtypes.items() if c not in date_cols},
+        parse_dates=date_cols,
+    )
+    return df.astype({c: dtypes[c] for c in date_cols})[list(dtypes)]
+
+def combine(name, frames):
+    # One frame from the per-source frames, typed even when there are none
+    if not frames:
+        return pd.DataFrame({c: pd.Series(dtype=t) for c, t in TABLE_DTYPES[name].items()})
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+def read_table_cached(name):
+    # One Feather copy per source file, so after an incremental load only the new or
+    # rewritten segments are parsed again
+    manifest = read_manifest()
+    frames = [read_csv_cached(name, path, manifest) for path in table_sources(name)]
+    return combine(name, frames)
+
+def read_csv_cached(name, path, manifest):
+    # Serve the Feather copy when it was built from the current file,
+    # otherwise re-parse the CSV once and refresh the copy
+    source = os.path.relpath(path, DATA_DIR)
+    cache_path = os.path.join(CACHE_DIR, os.path.splitext(source)[0].replace(os.sep, "__") + ".feather")
+    signature = {"dtypes": TABLE_DTYPES[name], "stat": file_stat(path)}
+
+    if manifest.get(source) == signature and os.path.exists(cache_path):
+        # Uncompressed Feather is memory-mapped. With one block per column, numeric and
+        # date columns are read-only views of the mapped file rather than copies, paged in
+        # as they are read (combine() still concatenates a partitioned table's segments).
+        return feather.read_table(cache_path, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+
+    df = read_csv(name, path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    feather.write_feather(df, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, cache_path)
+
+    manifest = read_manifest()
+    manifest[source] = signature
+    write_manifest(manifest)
+    return df
+
+def file_stat(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def source_signature(name):
+    # mtime and size of every source file and of the workbook they are generated
+    # from, plus the schema they are read with
+    signature = {"dtypes": TABLE_DTYPES[name]}
+    for path in table_sources(name) + [SOURCE_WORKBOOK]:
+        if os.path.exists(path):
+            signature[os.path.relpath(path, DATA_DIR)] = file_stat(path)
+    return signature
+
+def data_version():
+    # Short fingerprint of every source file and schema; changes whenever load_data
+    # would return different data
+    return hashlib.sha1(
+        json.dumps({name: source_signature(name) for name in TABLE_DTYPES}, sort_keys=True).encode()
+    ).hexdigest()[:12]
+
+def source_stats():
+    # mtime and size of every source file, by table. Unlike data_version() this leaves
+    # out the workbook, which setup_data reads but load_data does not.
+    return {
+        name: {os.path.relpath(path, DATA_DIR): file_stat(path) for path in table_sources(name) if os.path.exists(path)}
+        for name in TABLE_DTYPES
+    }
+
+def load_state(f_sales, f_inventory, sources, duplicate_policy=FACT_DUPLICATE_POLICY):
+    # What read_appended needs to know of a load_data: the source_stats() it read, or
+    # None when they changed while it ran (a segment written mid-load may or may not be
+    # in its rows), and the hashes of the fact rows it returned (see add_hashes), which
+    # the "sum" policy does without
+    hashes = {name: None for name in FACT_QUANTITIES}
+    if duplicate_policy != "sum":
+        hashes = {
+            name: add_hashes((np.empty(0, dtype=np.uint64),) * 2, pd.util.hash_pandas_object(df, index=False).to_numpy())
+            for name, df in zip(FACT_QUANTITIES, (f_sales, f_inventory))
+        }
+    return {"sources": sources, "hashes": hashes, "policy": duplicate_policy}
+
+def read_appended(state):
+    # The fact rows added since the load behind state (from load_state), cleaned of
+    # duplicates as load_data would clean them together with the rows already loaded.
+    # Returns (f_sales, f_inventory) holding only the new rows and the state after them,
+    # or None when the sources changed in any way but new fact segments (a rewritten
+    # month, a changed dimension, a single CSV grown in place): then only load_data
+    # returns the right rows.
+    if state["sources"] is None:
+        return None
+    sources = source_stats()
+    for name, known in state["sources"].items():
+        current = sources[name]
+        if any(current.get(path) != stat for path, stat in known.items()):
+            return None
+        if current != known and name not in FACT_QUANTITIES:
+            return None
+
+    manifest = read_manifest()
+    batches, hashes = [], {}
+    for name in FACT_QUANTITIES:
+        paths = sorted(set(sources[name]) - set(state["sources"][name]))
+        rows = combine(name, [read_csv_cached(name, os.path.join(DATA_DIR, path), manifest) for path in paths])
+        rows, hashes[name] = clean_appended(name, rows, state["hashes"][name], state["policy"])
+        batches.append(rows)
+    if source_stats() != sources:
+        return None
+    return tuple(batches), {"sources": sources, "hashes": hashes, "policy": state["policy"]}
+
+def clean_appended(name, rows, known, policy):
+    # clean_facts for rows added to a table whose rows so far have the hashes known.
+    # Under "sum" every copy just adds its quantity, as the folded row would carry it.
+    if policy == "sum":
+        return rows, None
+    hashes = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+    duplicated = pd.Series(hashes).duplicated().to_numpy()
+    for sorted_hashes in known:
+        if len(sorted_hashes):
+            found = np.searchsorted(sorted_hashes, hashes).clip(max=len(sorted_hashes) - 1)
+            duplicated = duplicated | (sorted_hashes[found] == hashes)
+    dropped = int(duplicated.sum())
+    if dropped and policy == "reject":
+        raise ValueError(f"{name}: {dropped} duplicate fact rows found")
+    if dropped:
+        logger.info("%s: %d duplicate rows dropped from appended rows (policy %s)", name, dropped, policy)
+        rows = rows[~duplicated].reset_index(drop=True)
+    return rows, add_hashes(known, hashes[~duplicated])
+
+def add_hashes(known, hashes):
+    # known, a pair of sorted hash arrays (all rows up to some point, and the rows
+    # appended since), with hashes added. They go into the second, short array, which
+    # is folded into the first once it passes APPEND_COMPACT_SHARE of it, so adding
+    # rows costs about as much as the rows appended so far.
+    base, recent = known
+    hashes = np.sort(hashes)
+    recent = np.insert(recent, np.searchsorted(recent, hashes), hashes)
+    if len(recent) > APPEND_COMPACT_SHARE * len(base):
+        base, recent = np.insert(base, np.searchsorted(base, recent), recent), recent[:0]
+    return base, recent
+
+def read_manifest():
+    try:
+        with open(os.path.join(CACHE_DIR, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_manifest(manifest):
+    path = os.path.join(CACHE_DIR, MANIFEST_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
 # def merge_dimensions(f_sales, f_inventory, d_products, d_date):
 #     sales_df = f_sales.merge(d_products, on="product_id", how="left").merge(d_date, on="date_id", how="left")
 #     inventory_df = f_inventory.merge(d_products, on="product_id", how="left").merge(d_date, on="date_id", how="left")
@@ -16,16 +262,45 @@ def load_data():
 
 #     return sales_df, inventory_df
 
-def merge_dimensions(f_sales, f_inventory, d_products, d_date):
-    d_date["date"] = pd.to_datetime(d_date["date"])
+def merge_dimensions(f_sales, f_inventory, d_products, d_date, dense=False):
+    d_date = d_date.assign(date=pd.to_datetime(d_date["date"]))
 
-    # Get all date-product combinations
-    date_product_matrix = d_date.merge(d_products, how="cross")
+    if dense:
+        # Get all date-product combinations, with zero quantities where there are no facts.
+        # The app keeps facts sparse; tests/test_dense_merge.py checks it against this.
+        date_product_matrix = d_date.merge(d_products, how="cross")
 
-    sales_df = date_product_matrix.merge(f_sales, on=["product_id", "date_id"], how="left")
-    inventory_df = date_product_matrix.merge(f_inventory, on=["product_id", "date_id"], how="left")
+        sales_df = date_product_matrix.merge(f_sales, on=["product_id", "date_id"], how="left")
+        inventory_df = date_product_matrix.merge(f_inventory, on=["product_id", "date_id"], how="left")
 
-    sales_df["quantity_sold"] = sales_df["quantity_sold"].fillna(0)
-    inventory_df["quantity_purchased"] = inventory_df["quantity_purchased"].fillna(0)
+        sales_df["quantity_sold"] = sales_df["quantity_sold"].fillna(0).astype(f_sales["quantity_sold"].dtype)
+        inventory_df["quantity_purchased"] = (
+            inventory_df["quantity_purchased"].fillna(0).astype(f_inventory["quantity_purchased"].dtype)
+        )
+
+        return sales_df, inventory_df
+
+    # Keep only real fact rows; pages put the empty date-product cells back with fill_gaps
+    sales_df = f_sales.merge(d_products, on="product_id").merge(d_date, on="date_id")
+    inventory_df = f_inventory.merge(d_products, on="product_id").merge(d_date, on="date_id")
 
     return sales_df, inventory_df
+
+def fill_gaps(agg, value_cols, products, dates):
+    # Reindex an aggregate onto every combination of its key values, as the dense
+    # date-product matrix would have produced them, with zeros for the missing cells.
+    # Key columns are looked up in the selected products, then in the selected dates.
+    keys = [c for c in agg.columns if c not in value_cols]
+    if products.empty or dates.empty:
+        return agg.iloc[0:0]
+
+    # Levels keep the aggregate's dtype, so categorical keys line up with their codes
+    levels = [
+        pd.Index(sorted((products if c in products.columns else dates)[c].dropna().unique())).astype(agg[c].dtype)
+        for c in keys
+    ]
+    if len(keys) == 1:
+        grid = pd.Index(levels[0], name=keys[0])
+    else:
+        grid = pd.MultiIndex.from_product(levels, names=keys)
+    return agg.set_index(keys)[value_cols].reindex(grid, fill_value=0).reset_index()
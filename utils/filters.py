@@ -1,40 +1,52 @@
 import streamlit as st
 import pandas as pd
 
-def sidebar_filters(sales_df, inventory_df, d_products):
-    st.sidebar.header("🔍 Filter Data")
+from config import SEARCH_RESULT_LIMIT
+from utils.product_search import products_in_type, search
 
-    product_types = sorted(d_products["type"].dropna().unique().tolist())
-    type_options = ["Overall"] + product_types
-    selected_type = st.sidebar.selectbox("Select Product Type", type_options)
+def sidebar_filters(index, d_date):
+    # Product and date filters; index is build_index(d_products), built once per data
+    # version. The product list holds at most SEARCH_RESULT_LIMIT names, so catalogs of
+    # any size are searched and picked from without sending every name to the browser.
+    st.sidebar.header("Filter Data")
 
-    if selected_type == "Overall":
-        all_products = sorted(d_products["product_name"].dropna().unique().tolist())
-    else:
-        all_products = sorted(
-            d_products[d_products["type"] == selected_type]["product_name"].dropna().unique().tolist()
-        )
+    # Product type
+    type_options = ["Overall"] + index["type_options"]
+    selected_type = st.sidebar.selectbox("Select Product Type", type_options)
+    product_type = None if selected_type == "Overall" else selected_type
+    all_products_in_type = products_in_type(index, product_type)
 
-    search_term = st.sidebar.text_input("🔎 Search Product")
+    # Search + Select All Toggle
+    search_term = st.sidebar.text_input("🔎 Search Product").strip()
     select_all = st.sidebar.checkbox("Select All Products", value=True)
 
     if search_term:
-        filtered_products = [p for p in all_products if search_term.lower() in p.lower()]
+        filtered_products, matches = search(index, search_term, product_type)
         default_selected = filtered_products
     else:
-        filtered_products = all_products
-        default_selected = all_products if select_all else []
-
-    selected_products = st.sidebar.multiselect(
-        "Select Product(s)", options=filtered_products, default=default_selected, key="product_select"
-    )
-
-    st.sidebar.caption(
-        f"Selected {len(selected_products)} of {len(filtered_products)} shown | {len(all_products)} total in type"
-    )
-
-    min_date = sales_df["date"].min()
-    max_date = sales_df["date"].max()
+        filtered_products = all_products_in_type[:SEARCH_RESULT_LIMIT]
+        matches = len(all_products_in_type)
+        default_selected = filtered_products if select_all else []
+
+    if not search_term and select_all and matches > len(filtered_products):
+        # Too many to list: select the whole type without a multiselect entry per product
+        selected_products = all_products_in_type
+        st.sidebar.caption(f"All {matches} products in type selected. Search, or untick Select All, to pick some.")
+    else:
+        selected_products = st.sidebar.multiselect(
+            "Select Product(s)",
+            options=filtered_products,
+            default=default_selected,
+            key="product_select"
+        )
+        caption = f"Selected {len(selected_products)} of {len(filtered_products)} shown | {len(all_products_in_type)} total in type"
+        if matches > len(filtered_products):
+            caption += f" | best of {matches} matches" if search_term else " | search to list the rest"
+        st.sidebar.caption(caption)
+
+    # Date Range
+    min_date = d_date["date"].min()
+    max_date = d_date["date"].max()
     selected_dates = st.sidebar.date_input("Select Date Range", [min_date, max_date])
     start_date, end_date = pd.to_datetime(selected_dates[0]), pd.to_datetime(selected_dates[1])
 
@@ -0,0 +1,75 @@
+import functools
+import logging
+import time
+
+import streamlit as st
+
+from config import SHOW_PAGE_RUNS
+from utils.analytics import check_dataset, selected_rows
+from utils.profiling import export_json, profile_stage, stage_summary
+from utils.result_cache import RESULT_CACHE
+
+logger = logging.getLogger(__name__)
+
+def track_page(show):
+    # Count and log every run of a page's show() in the session, so it is visible
+    # which pages a widget interaction actually recomputed, and profile it as a stage
+    # reading the cube rows its (data, spec) selects. A page that changed the shared
+    # dataset raises here, before any other session can read it.
+    name = show.__module__.rsplit(".", 1)[-1]
+
+    @functools.wraps(show)
+    def wrapper(*args, **kwargs):
+        runs = st.session_state.setdefault("page_runs", {})
+        runs[name] = runs.get(name, 0) + 1
+        logger.info("page %s recomputed (run %d this session)", name, runs[name])
+
+        with profile_stage(f"page {name}", selected_rows(*args)):
+            result = show(*args, **kwargs)
+        check_dataset(args[0], f"page {name}")
+        if SHOW_PAGE_RUNS:
+            st.caption(f"🔁 {name} recomputed {runs[name]} time(s) this session")
+        return result
+    return wrapper
+
+def perf_panel():
+    # How the result cache is doing and the per-stage timings recorded in this process,
+    # with the raw runs as a JSON download
+    with st.sidebar.expander("⏱️ Performance"):
+        cache = RESULT_CACHE.stats()
+        lookups = cache["hits"] + cache["misses"]
+        hit_rate = f" ({cache['hits'] / lookups:.0%} hit rate)" if lookups else ""
+        st.caption(
+            f"Result cache: {cache['entries']} entries, {cache['bytes'] / 2**20:.2f} of "
+            f"{cache['max_bytes'] / 2**20:.0f} MB; {cache['hits']} hits, {cache['misses']} misses"
+            f"{hit_rate}, {cache['evictions']} evictions"
+        )
+
+        summary = stage_summary()
+        if summary.empty:
+            st.caption("No stages recorded yet.")
+            return
+        summary["memory_delta"] = summary["memory_delta"] / 2**20
+        st.dataframe(
+            summary.rename(columns={
+                "stage": "Stage",
+                "runs": "Runs",
+                "last_seconds": "Last (s)",
+                "mean_seconds": "Mean (s)",
+                "rows_in": "Rows In",
+                "rows_out": "Rows Out",
+                "memory_delta": "Memory Δ (MB)",
+            }),
+            hide_index=True,
+        )
+        st.download_button("Download runs (JSON)", export_json(), file_name="profile.json", mime="application/json")
+
+def version_stamp(refresher, bundle):
+    # Data version this run shows and when it was loaded, with any background refresh
+    # under way or failed
+    loaded = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(bundle["loaded_at"]))
+    st.sidebar.caption(f"🗂️ Data version {bundle['version']}, loaded {loaded}")
+    if refresher.refreshing:
+        st.sidebar.caption(f"🔄 Loading data version {refresher.refreshing} in the background")
+    if refresher.error:
+        st.sidebar.warning(f"The latest data failed to load ({refresher.error}); showing version {bundle['version']}.")
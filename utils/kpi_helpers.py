@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+def safe_divide(numerator, denominator, default):
+    # numerator / denominator wherever the denominator is non-zero, `default` elsewhere.
+    # Takes scalars or aligned Series; a NaN denominator still gives NaN, as `if x != 0` did.
+    num = np.asarray(numerator, dtype="float64")
+    den = np.asarray(denominator, dtype="float64")
+    out = np.full(np.broadcast(num, den).shape, default, dtype="float64")
+    np.divide(num, den, out=out, where=den != 0)
+    if isinstance(numerator, pd.Series):
+        return pd.Series(out, index=numerator.index)
+    return out[()]
+
+def profit_pct(profit, base):
+    # Profit as a percentage of `base` (sales revenue or realized cost); 0 when the base is 0
+    return safe_divide(profit, base, 0.0) * 100
+
+def cashflow_ratio(sales_revenue, inventory_cost):
+    # Sales per dollar of inventory purchased; inf when nothing was purchased
+    return safe_divide(sales_revenue, inventory_cost, np.inf)
@@ -0,0 +1,84 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from config import SEARCH_RESULT_LIMIT
+
+# Product lookup for the sidebar, built once per data version: the sorted product names
+# of every type, and an index from each three-letter sequence to the products whose
+# name contains it, so a search only checks the few names that can match.
+
+GRAM = 3
+
+def build_index(d_products):
+    products = d_products[["product_name", "type"]].dropna(subset=["product_name"]).astype(str)
+    products = products.drop_duplicates("product_name").sort_values("product_name", ignore_index=True)
+    names = products["product_name"]
+    lower = names.str.lower()
+
+    # (gram, product position) for every gram of every name, one slice offset at a time
+    pairs = []
+    lengths = lower.str.len().to_numpy()
+    for start in range(max(0, lengths.max(initial=0) - GRAM + 1)):
+        has_gram = lengths >= start + GRAM
+        pairs.append(pd.DataFrame({
+            "gram": lower[has_gram].str.slice(start, start + GRAM),
+            "position": np.flatnonzero(has_gram),
+        }))
+    grams = pd.concat(pairs, ignore_index=True).drop_duplicates() if pairs else pd.DataFrame(columns=["gram", "position"])
+    postings = {gram: np.sort(grams["position"].to_numpy()[rows]) for gram, rows in grams.groupby("gram").indices.items()}
+
+    types = products["type"]
+    return {
+        "names": names.to_numpy(dtype=object),
+        "lower": lower,
+        "types": types.to_numpy(dtype=object),
+        "type_options": sorted(types.dropna().unique().tolist()),
+        "by_type": {t: names[types == t].tolist() for t in types.dropna().unique()},
+        "all": names.tolist(),
+        "postings": postings,
+    }
+
+def products_in_type(index, product_type=None):
+    # Sorted product names of a type, or of all types
+    if product_type is None:
+        return index["all"]
+    return index["by_type"].get(product_type, [])
+
+def candidates(index, term):
+    # Positions of the products whose name may contain term: those holding all of its
+    # grams, or every product when term is shorter than a gram
+    if len(term) < GRAM:
+        return np.arange(len(index["names"]))
+    grams = {term[i:i + GRAM] for i in range(len(term) - GRAM + 1)}
+    lists = sorted((index["postings"].get(g, np.empty(0, dtype=np.int64)) for g in grams), key=len)
+    found = lists[0]
+    for positions in lists[1:]:
+        if found.size == 0:
+            break
+        found = np.intersect1d(found, positions, assume_unique=True)
+    return found
+
+def search(index, term, product_type=None, limit=SEARCH_RESULT_LIMIT):
+    # Product names containing term (ignoring case), optionally of one type: exact
+    # matches first, then names starting with term, then names with a word starting
+    # with it, then the rest, alphabetical within each. Returns the first limit of
+    # them and how many matched in all.
+    term = term.strip().lower()
+    found = candidates(index, term)
+    if product_type is not None:
+        found = found[index["types"][found] == product_type]
+
+    lower = index["lower"].take(found)
+    matched = lower.str.contains(term, regex=False).to_numpy(dtype=bool)
+    found, lower = found[matched], lower[matched]
+
+    rank = np.full(len(found), 3)
+    rank[lower.str.contains(r"(?:^|[\s_\-])" + re.escape(term)).to_numpy(dtype=bool)] = 2
+    rank[lower.str.startswith(term).to_numpy(dtype=bool)] = 1
+    rank[(lower == term).to_numpy(dtype=bool)] = 0
+
+    # Positions follow the sorted names, so they break ties alphabetically
+    order = np.lexsort((found, rank))[:limit]
+    return index["names"][found[order]].tolist(), len(found)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# Guards for data shared between sessions: the dataset and cached analytics results.
+# freeze() backs frames with read-only arrays, so writing values in place (.loc, .iloc)
+# raises instead of changing what every other session sees. Adding, dropping or replacing
+# a column writes no array, so fingerprint() records which arrays make up each frame and
+# a later fingerprint that differs shows the frame itself was changed.
+
+def owner(values):
+    # The numpy array holding the memory behind values, or None for arrays kept
+    # elsewhere (Arrow-backed strings, which cannot be written to anyway)
+    if isinstance(values, pd.Categorical):
+        values = values.codes
+    if not isinstance(values, np.ndarray):
+        return None
+    while isinstance(values.base, np.ndarray):
+        values = values.base
+    return values
+
+def read_only(column):
+    # The values of a series over read-only arrays, without copying them
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        codes.flags.writeable = False
+        return pd.Categorical.from_codes(codes, dtype=column.dtype)
+    values = column.to_numpy() if isinstance(column.dtype, np.dtype) else column.array
+    if isinstance(values, np.ndarray):
+        values.flags.writeable = False
+    return values
+
+def freeze(value):
+    # value (a frame, series, array, or a container of them) rebuilt over read-only
+    # arrays. Plain arrays are frozen in place; indexes cannot be written to already.
+    if isinstance(value, pd.DataFrame):
+        return pd.DataFrame({name: read_only(column) for name, column in value.items()}, index=value.index, copy=False)
+    if isinstance(value, pd.Series):
+        return pd.Series(read_only(value), index=value.index, name=value.name, copy=False)
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+        return value
+    if isinstance(value, dict):
+        return {k: freeze(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(freeze(v) for v in value)
+    return value
+
+def fingerprint(value):
+    # Shape of value down to the identity of each array: equal fingerprints mean no
+    # frame in it gained, lost or swapped a column, or was re-indexed
+    if isinstance(value, pd.DataFrame):
+        return (
+            id(value),
+            id(value.index),
+            tuple((name, str(column.dtype), id(owner(column.values))) for name, column in value.items()),
+        )
+    if isinstance(value, (pd.Series, pd.Index, np.ndarray)):
+        return id(value), len(value)
+    if isinstance(value, dict):
+        return tuple((k, fingerprint(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(fingerprint(v) for v in value)
+    return None
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+
+from config import DATA_POLL_SECONDS, VERIFY_APPENDS
+from utils.analytics import append_facts, build_dataset
+from utils.cube import cube_differences
+from utils.data_loader import data_version, load_data, load_dimensions, load_state, read_appended, source_stats
+from utils.product_search import build_index
+from utils.read_only import freeze
+
+logger = logging.getLogger(__name__)
+
+class DataRefresher:
+    # The data every session reads, as one bundle per data version: the version, the
+    # frozen dimensions, the product search index and the dataset. A watcher thread polls
+    # the files under data/ and, once a new version has stopped changing, builds its
+    # bundle in the background and swaps it in with one assignment. Requests keep reading
+    # the bundle they got until then, so none of them waits on a reload. When all that
+    # changed is new fact segments, the new bundle adds them to the current dataset.
+
+    def __init__(self, poll_seconds=DATA_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.current = None
+        self.refreshing = None
+        self.failed = None
+        self.error = None
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def snapshot(self):
+        # The bundle to serve. Only the app's first run finds none yet and loads the
+        # dimensions itself; the dataset follows through dataset() once the sidebar is up.
+        if self.current is None:
+            with self.lock:
+                if self.current is None:
+                    self.current = load_bundle(data_version())
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.watch, name="data_refresh", daemon=True)
+                    self.thread.start()
+        return self.current
+
+    def dataset(self, bundle):
+        # bundle's dataset, built here only for the first bundle; refreshed bundles come with theirs
+        if bundle["dataset"] is None:
+            with self.lock:
+                if bundle["dataset"] is None:
+                    bundle["dataset"], bundle["facts"] = load_dataset(bundle["version"])
+        return bundle["dataset"]
+
+    def watch(self):
+        # A loader writing several files changes the version more than once, so a new
+        # version is only loaded when two polls in a row agree on it. A version that
+        # failed to load is tried again only once the files change again. Nothing is
+        # loaded before the first dataset is: built later, it would count as the newer.
+        pending = None
+        while True:
+            time.sleep(self.poll_seconds)
+            if self.current["dataset"] is None:
+                continue
+            try:
+                version = data_version()
+            except OSError:
+                logger.exception("Could not read the data files; checking again in %ss", self.poll_seconds)
+                continue
+            if version == self.current["version"] or version == self.failed:
+                pending = None
+            elif version != pending:
+                pending = version
+            else:
+                self.refresh(version)
+                pending = None
+
+    def refresh(self, version):
+        # Build version's bundle, then swap it in. On failure the current bundle stays.
+        self.refreshing = version
+        try:
+            with self.lock:
+                bundle = appended_bundle(self.current, version)
+                if bundle is None:
+                    bundle = load_bundle(version)
+                    bundle["dataset"], bundle["facts"] = load_dataset(version)
+        except Exception as e:
+            logger.exception("Loading data version %s failed; still serving %s", version, self.current["version"])
+            self.failed = version
+            self.error = f"{type(e).__name__}: {e}"
+        else:
+            self.current = bundle
+            self.failed = None
+            self.error = None
+            logger.info("Data version %s swapped in", version)
+        finally:
+            self.refreshing = None
+
+def load_bundle(version):
+    d_products, d_date = freeze(load_dimensions())
+    return {
+        "version": version,
+        "loaded_at": time.time(),
+        "dimensions": (d_products, d_date),
+        "product_index": build_index(d_products),
+        "dataset": None,
+        "facts": None,
+    }
+
+def load_dataset(version):
+    # The dataset from a full load_data, and the state read_appended extends it from
+    sources = source_stats()
+    f_sales, f_inventory, d_products, d_date = load_data()
+    facts = load_state(f_sales, f_inventory, sources if source_stats() == sources else None)
+    return build_dataset(f_sales, f_inventory, d_products, d_date, version=version), facts
+
+def appended_bundle(bundle, version):
+    # bundle as of version when the only change since it was loaded is new fact
+    # segments, or None when something else changed. Its dimensions and search index
+    # carry over; the new fact rows are added to its dataset.
+    if bundle["dataset"] is None:
+        return None
+    appended = read_appended(bundle["facts"])
+    if appended is None:
+        return None
+    (f_sales, f_inventory), facts = appended
+    data = append_facts(bundle["dataset"], f_sales, f_inventory, version=version)
+    logger.info("Data version %s: %d sales and %d inventory rows appended", version, len(f_sales), len(f_inventory))
+
+    if VERIFY_APPENDS:
+        full, full_facts = load_dataset(version)
+        differences = cube_differences(data["cube"], full["cube"])
+        if differences:
+            logger.error(
+                "Data version %s appended differs from a full load in %s; serving the full load",
+                version, ", ".join(differences),
+            )
+            data, facts = full, full_facts
+        else:
+            logger.info("Data version %s matches a full load", version)
+    return {**bundle, "version": version, "loaded_at": time.time(), "dataset": data, "facts": facts}
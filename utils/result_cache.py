@@ -0,0 +1,116 @@
+import functools
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from config import PAGE_WORKERS, RESULT_CACHE_MAX_BYTES
+from utils.profiling import add_rows_out
+from utils.read_only import freeze
+
+class ResultCache:
+    # LRU cache for analytics results, bounded by the estimated size of what it holds.
+    # Entries belong to one dataset, the newest seen: datasets are numbered in the order
+    # they are built, and a higher generation drops everything older. Runs still reading
+    # an older dataset after that get their results computed but not kept, so they do not
+    # empty the cache again on their way out. Data that goes back to an earlier version is
+    # a new dataset with a new generation, so it is cached like any other.
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.generation = None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, generation, key, compute):
+        with self.lock:
+            stale = self.generation is not None and generation < self.generation
+            if not stale and generation != self.generation:
+                self.clear_entries()
+                self.generation = generation
+            if not stale and key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        if stale:
+            return value
+        size = estimate_size(value)
+
+        with self.lock:
+            if generation != self.generation or size > self.max_bytes:
+                return value
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def clear_entries(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "generation": self.generation,
+                "entries": len(self.entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+def estimate_size(value):
+    # Bytes held by a result: frames and series by their memory usage, containers by their items
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+# One cache per process, shared by every session
+RESULT_CACHE = ResultCache(RESULT_CACHE_MAX_BYTES)
+
+def cached_result(func):
+    # Memoize an analytics function of (data, *args) on the dataset generation and the
+    # remaining arguments, which must be hashable (a FilterSpec, column names, a grain).
+    # The rows returned count towards the profiled stage that asked, usually a page.
+    # Results are shared by every session asking the same, so they come back frozen.
+    @functools.wraps(func)
+    def wrapper(data, *args):
+        result = RESULT_CACHE.get_or_compute(data["generation"], (func.__name__,) + args, lambda: freeze(func(data, *args)))
+        add_rows_out(result)
+        return result
+    return wrapper
+
+# Threads for compute_ahead, shared by every session
+POOL = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix="compute_ahead") if PAGE_WORKERS > 1 else None
+
+def compute_ahead(jobs):
+    # Run cached analytics calls, (func, data, *args) each, side by side on the pool and
+    # wait for them, so the pages making the same calls next find their results cached and
+    # a rerun takes about as long as its slowest page. Results are the same whichever
+    # finishes first. A call listed twice runs once; errors are left for the page making
+    # the call to raise where it is shown.
+    if POOL is None:
+        return
+    unique = {(job[0],) + job[2:]: job for job in jobs}
+    wait([POOL.submit(*job) for job in unique.values()])
@@ -1,42 +1,363 @@
-import pandas as pd
+import argparse
+import json
 import os
+import re
+import shutil
+import time
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+
+from config import DATA_DIR, INGEST_MEMORY_BUDGET, SOURCE_WORKBOOK
+from utils.data_loader import TABLE_DTYPES, file_stat
+
+# Run from the repo root: python -m utils.setup_data [--stream] [--memory-budget MB]
+#
+# Dimensions are small and written whole. Facts are split into one folder per month
+# of their date, each holding append-only segments (part-00000.csv, part-00001.csv, ...).
+# A load only touches the months whose rows changed: new rows in a month become a new
+# segment, and a month with changed or removed rows is rewritten as a single segment.
+#
+# Segments are CSV, which the loader parses once into a Feather copy (see
+# data_loader.read_csv_cached). Exact duplicate fact rows are written as they are:
+# load_data applies FACT_DUPLICATE_POLICY to them, and "sum" needs every copy.
+
+# Fact columns kept from each sheet, in the order they are written
+FACT_COLUMNS = {
+    "f_sales": ["product_id", "date_id", "quantity_sold"],
+    "f_inventory": ["product_id", "date_id", "quantity_purchased"],
+}
+
+# Row count and checksum of every partition as last written
+PARTITION_MANIFEST = "_partitions.json"
+
+# Partition for fact rows whose date_id is not in d_date
+UNDATED = "undated"
+
+# Segment file names within a partition, numbered from 0
+SEGMENT = re.compile(r"part-(\d{5})\.csv")
+
+def write_dimension(df, name, sort_col):
+    # Rewrite the CSV only when its contents change, so its cached copy stays valid
+    path = os.path.join(DATA_DIR, f"{name}.csv")
+    text = df.drop_duplicates().sort_values(sort_col).to_csv(index=False)
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == text:
+                return False
+    write_atomic(path, text)
+    return True
+
+def write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+# ------------------------------------------------------------------
+# Fact partitions
+# ------------------------------------------------------------------
+
+def partition_keys(facts, d_date):
+    # Month of each fact row's date, as "YYYY-MM"
+    months = d_date.set_index("date_id")["date"].dt.strftime("%Y-%m")
+    return facts["date_id"].map(months).fillna(UNDATED)
+
+def row_hashes(rows):
+    return pd.util.hash_pandas_object(rows, index=False).to_numpy()
+
+def partition_entry(batches):
+    # Row count and checksum of a partition. The checksum is order-independent: the
+    # wrapped sum of the row hashes.
+    count, sums = 0, []
+    for rows in batches:
+        count += len(rows)
+        sums.append(row_hashes(rows).sum())
+    return {"rows": count, "checksum": str(np.array(sums, dtype=np.uint64).sum())}
+
+def segment_files(folder):
+    # Segment files of a partition, with their mtime and size
+    if not os.path.isdir(folder):
+        return {}
+    return {f: file_stat(os.path.join(folder, f)) for f in sorted(os.listdir(folder)) if SEGMENT.fullmatch(f)}
+
+def next_segment(folder):
+    # Number after the highest segment on disk, which a run that stopped before saving
+    # the manifest may have written without it knowing
+    return max((int(SEGMENT.fullmatch(f).group(1)) + 1 for f in segment_files(folder)), default=0)
+
+def stored_counts(name, folder, size):
+    # Distinct row hashes of a partition on disk, sorted, and how often each occurs,
+    # read size rows at a time so only the hashes are held for the whole month
+    hashes = [
+        row_hashes(rows)
+        for f in segment_files(folder)
+        for rows in pd.read_csv(os.path.join(folder, f), dtype=TABLE_DTYPES[name], chunksize=size)
+    ]
+    return np.unique(np.concatenate(hashes), return_counts=True)
+
+def match_stored(batches, stored):
+    # Which incoming rows are stored already, as a mask per batch, matching each
+    # stored row at most once so exact duplicates are counted rather than collapsed,
+    # and whether every stored row was matched
+    unique, remaining = stored
+    remaining = remaining.copy()
+    masks = []
+    for rows in batches:
+        hashes = row_hashes(rows)
+        found = np.searchsorted(unique, hashes).clip(max=max(len(unique) - 1, 0))
+        hit = np.flatnonzero(unique[found] == hashes) if len(unique) else found[:0]
+        occurrence = pd.Series(found[hit]).groupby(found[hit]).cumcount().to_numpy()
+        hit = hit[occurrence < remaining[found[hit]]]
+        np.subtract.at(remaining, found[hit], 1)
+        mask = np.zeros(len(rows), dtype=bool)
+        mask[hit] = True
+        masks.append(mask)
+    return masks, not remaining.any()
+
+def write_segment(folder, batches, number):
+    # One segment from frames of rows, each sorted by date and product as it is written
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"part-{number:05d}.csv")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        for i, rows in enumerate(batches):
+            rows.sort_values(["date_id", "product_id"]).to_csv(f, index=False, header=i == 0)
+    os.replace(tmp_path, path)
+
+def frame_batches(groups):
+    # (month, rows) pairs held in memory, as update_fact_partitions takes them
+    return ((partition, lambda rows=rows: [rows]) for partition, rows in groups)
+
+def update_fact_partitions(name, partitions, memory_budget=INGEST_MEMORY_BUDGET):
+    # Bring data/<name>/ in line with (month, batches) pairs covering every fact row,
+    # where batches() gives the month's rows as frames and can be called more than once,
+    # touching only the months that changed. Returns how many partitions were new, left
+    # alone, appended to, rewritten or removed.
+    #
+    # The manifest is only trusted for a month whose segment files are still the ones
+    # it recorded; any other month is compared with the rows on disk. The manifest is
+    # saved after every month written, so a run that stops part way loses little.
+    #
+    # A month is compared a batch at a time against the hashes of its stored rows, read
+    # within memory_budget, so besides a batch it takes about 16 bytes per stored row
+    # and one per incoming row.
+    root = os.path.join(DATA_DIR, name)
+    os.makedirs(root, exist_ok=True)
+    manifest_path = os.path.join(root, PARTITION_MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    stats = {"new": 0, "unchanged": 0, "appended": 0, "rewritten": 0, "removed": 0, "rows_written": 0}
+    updated = {}
+    for partition, read in partitions:
+        # Same dtypes as the stored segments are read with, so equal rows hash equal
+        def batches(read=read):
+            for rows in read():
+                yield rows[FACT_COLUMNS[name]].astype(TABLE_DTYPES[name]).reset_index(drop=True)
+
+        entry = partition_entry(batches())
+        folder = os.path.join(root, partition)
+        known = manifest.get(partition)
+
+        if (
+            known is not None
+            and known["rows"] == entry["rows"]
+            and known["checksum"] == entry["checksum"]
+            and known.get("files") == segment_files(folder)
+        ):
+            stats["unchanged"] += 1
+            updated[partition] = known
+            continue
+
+        stored_files = segment_files(folder)
+        masks = None
+        if stored_files:
+            # Append when every stored row is still there, otherwise rewrite the month
+            stored = stored_counts(name, folder, chunk_rows(memory_budget, len(FACT_COLUMNS[name])))
+            masks, kept = match_stored(batches(), stored)
+            if not kept:
+                masks = None
+
+        if masks is None:
+            shutil.rmtree(folder, ignore_errors=True)
+            write_segment(folder, batches(), 0)
+            stats["rewritten" if stored_files else "new"] += 1
+            stats["rows_written"] += entry["rows"]
+        elif not all(mask.all() for mask in masks):
+            new_rows = (rows[~mask] for rows, mask in zip(batches(), masks))
+            write_segment(folder, new_rows, next_segment(folder))
+            stats["appended"] += 1
+            stats["rows_written"] += sum(int((~mask).sum()) for mask in masks)
+        else:
+            stats["unchanged"] += 1
+
+        updated[partition] = {**entry, "files": segment_files(folder)}
+        write_atomic(manifest_path, json.dumps({**manifest, **updated}, indent=2, sort_keys=True))
+
+    # Months that no longer have any rows, including any a stopped run left unrecorded
+    folders = {f for f in os.listdir(root) if os.path.isdir(os.path.join(root, f))}
+    for partition in (set(manifest) | folders) - set(updated):
+        shutil.rmtree(os.path.join(root, partition), ignore_errors=True)
+        stats["removed"] += 1
+
+    if updated != manifest:
+        write_atomic(manifest_path, json.dumps(updated, indent=2, sort_keys=True))
+    return stats
+
+# ------------------------------------------------------------------
+# Streaming workbook reader
+# ------------------------------------------------------------------
+
+# Rough cost of one cell while a chunk is held as Python values and then as a frame
+BYTES_PER_CELL = 100
+
+def chunk_rows(memory_budget, columns):
+    # Rows of that many columns that fit in memory_budget
+    return max(1, memory_budget // (BYTES_PER_CELL * max(1, columns)))
+
+def sheet_chunks(workbook, sheet, memory_budget):
+    # Frames of up to memory_budget worth of rows from a read-only worksheet, which
+    # parses the sheet as it goes instead of loading it whole. Blank rows are skipped.
+    rows = workbook[sheet].iter_rows(values_only=True)
+    header = [c for c in next(rows, ()) if c is not None]
+    size = chunk_rows(memory_budget, len(header))
+
+    chunk = []
+    chunks = 0
+    for row in rows:
+        row = row[:len(header)]
+        if all(v is None for v in row):
+            continue
+        chunk.append(row)
+        if len(chunk) == size:
+            yield pd.DataFrame(chunk, columns=header)
+            chunk = []
+            chunks += 1
+    if chunk or chunks == 0:
+        yield pd.DataFrame(chunk, columns=header)
+
+def stream_dimension(workbook, name, sort_col, memory_budget):
+    # Dimension rows without exact duplicates, dropped through a set of the rows seen
+    seen = set()
+    unique = []
+    for chunk in sheet_chunks(workbook, name, memory_budget):
+        for row in chunk.itertuples(index=False, name=None):
+            if row not in seen:
+                seen.add(row)
+                unique.append(row)
+        columns = list(chunk.columns)
+    df = pd.DataFrame(unique, columns=columns)
+    write_dimension(df, name, sort_col)
+    return df, len(unique)
+
+def stream_partitions(workbook, name, d_date, memory_budget, counter):
+    # Stage every chunk, split by month, into one typed Arrow file per month, then hand
+    # the months over one at a time as readers of their staged batches, so only one
+    # chunk or batch of rows is in memory at a time.
+    staging = os.path.join(DATA_DIR, ".staging", name)
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    schema = pa.schema([(c, pa.from_numpy_dtype(TABLE_DTYPES[name][c])) for c in FACT_COLUMNS[name]])
+
+    writers = {}
+    try:
+        for chunk in sheet_chunks(workbook, name, memory_budget):
+            chunk = chunk[FACT_COLUMNS[name]].astype(TABLE_DTYPES[name])
+            counter["rows"] += len(chunk)
+            for partition, rows in chunk.groupby(partition_keys(chunk, d_date)):
+                if partition not in writers:
+                    writers[partition] = pa.ipc.new_stream(os.path.join(staging, f"{partition}.arrow"), schema)
+                writers[partition].write_table(pa.Table.from_pandas(rows, schema=schema, preserve_index=False))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    try:
+        for partition in sorted(writers):
+            yield partition, lambda path=os.path.join(staging, f"{partition}.arrow"): staged_batches(path)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+def staged_batches(path):
+    with pa.ipc.open_stream(path) as reader:
+        for batch in reader:
+            yield batch.to_pandas()
+
+# ------------------------------------------------------------------
+# Load
+# ------------------------------------------------------------------
+
+def report(name, rows, seconds, stats=None):
+    line = f"{name}: {rows} rows in {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)"
+    if stats is not None:
+        line += (
+            f"; {stats['rows_written']} rows written, partitions {stats['new']} new, {stats['unchanged']} unchanged, "
+            f"{stats['appended']} appended, {stats['rewritten']} rewritten, {stats['removed']} removed"
+        )
+    print(line)
+
+def load_workbook():
+    # Whole sheets through pandas. Blank rows are skipped, as the streaming load skips them.
+    xl = pd.ExcelFile(SOURCE_WORKBOOK)
+    parse = lambda sheet: xl.parse(sheet).dropna(how="all")
+
+    # d_products / d_date (Dimension Tables)
+    write_dimension(parse("d_products"), "d_products", "product_id")
+    d_date = parse("d_date").drop_duplicates()
+    write_dimension(d_date, "d_date", "date_id")
+    d_date["date"] = pd.to_datetime(d_date["date"])
+
+    # f_sales / f_inventory (Fact Tables)
+    for name in FACT_COLUMNS:
+        started = time.perf_counter()
+        facts = parse(name)
+        stats = update_fact_partitions(name, frame_batches(facts.groupby(partition_keys(facts, d_date), sort=True)))
+        report(name, len(facts), time.perf_counter() - started, stats)
+
+def stream_workbook(memory_budget):
+    # Sheets chunk by chunk in read-only mode, within memory_budget bytes
+    workbook = openpyxl.load_workbook(SOURCE_WORKBOOK, read_only=True, data_only=True)
+    try:
+        # d_products / d_date (Dimension Tables)
+        for name, sort_col in (("d_products", "product_id"), ("d_date", "date_id")):
+            started = time.perf_counter()
+            df, rows = stream_dimension(workbook, name, sort_col, memory_budget)
+            report(name, rows, time.perf_counter() - started)
+            if name == "d_date":
+                d_date = df.assign(date=pd.to_datetime(df["date"]))
+
+        # f_sales / f_inventory (Fact Tables)
+        for name in FACT_COLUMNS:
+            started = time.perf_counter()
+            counter = {"rows": 0}
+            stats = update_fact_partitions(
+                name, stream_partitions(workbook, name, d_date, memory_budget, counter), memory_budget
+            )
+            report(name, counter["rows"], time.perf_counter() - started, stats)
+    finally:
+        workbook.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the source workbook into data/")
+    parser.add_argument("--stream", action="store_true", help="read sheets in chunks within a memory budget")
+    parser.add_argument(
+        "--memory-budget", type=int, default=INGEST_MEMORY_BUDGET // 2**20, metavar="MB",
+        help="memory for the rows --stream holds at once, in MB",
+    )
+    args = parser.parse_args()
+
+    if args.stream:
+        stream_workbook(args.memory_budget * 2**20)
+    else:
+        load_workbook()
+
+    print("✅ ERD-based tables saved in /data folder.")
 
-# Load Excel
-source_file = "data/CaseStudy_Role_SA.xlsx"
-xl = pd.ExcelFile(source_file)
-
-# Load raw sheets
-sales_df = xl.parse("f_sales")
-inventory_df = xl.parse("f_inventory")
-product_df = xl.parse("d_products")
-date_df = xl.parse("d_date")
-
-# ----------------------------
-# d_products (Dimension Table)
-# ----------------------------
-d_products = product_df.drop_duplicates().copy()
-d_products = d_products.sort_values("product_id")
-d_products.to_csv("data/d_products.csv", index=False)
-
-# ------------------------
-# d_date (Dimension Table)
-# ------------------------
-d_date = date_df.drop_duplicates().copy()
-d_date = d_date.sort_values("date_id")
-d_date.to_csv("data/d_date.csv", index=False)
-
-# ---------------------
-# f_sales (Fact Table)
-# ---------------------
-f_sales = sales_df[["product_id", "date_id", "quantity_sold"]].copy()
-f_sales = f_sales.sort_values(by=["date_id", "product_id"])
-f_sales.to_csv("data/f_sales.csv", index=False)
-
-# -------------------------
-# f_inventory (Fact Table)
-# -------------------------
-f_inventory = inventory_df[["product_id", "date_id", "quantity_purchased"]].copy()
-f_inventory = f_inventory.sort_values(by=["date_id", "product_id"])
-f_inventory.to_csv("data/f_inventory.csv", index=False)
-
-print("✅ ERD-based tables saved as CSV in /data folder.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import FACT_QUANTITIES, TABLE_DTYPES
+
+# Synthetic tables in the shape of the case study data, at any scale.
+# Run from the repo root: python -m utils.synthetic_data --rows 1000000 --out data_synthetic
+
+# Month and day of the holidays flagged every year, on top of the random ones
+FIXED_HOLIDAYS = [(1, 1), (7, 4), (11, 24), (12, 24), (12, 25), (12, 26), (12, 31)]
+
+def generate(
+    fact_rows,
+    n_days=3 * 365,
+    density=0.2,
+    holiday_rate=0.02,
+    food_share=0.6,
+    duplicate_rate=0.01,
+    inventory_ratio=0.25,
+    start="2016-01-01",
+    seed=0,
+):
+    # f_sales, f_inventory, d_products and d_date (as load_data returns them, before the
+    # calendar columns) with about fact_rows sales rows.
+    #   density: share of product-days with a sale; sets how many products there are
+    #   holiday_rate: share of days flagged as holidays besides FIXED_HOLIDAYS
+    #   food_share: share of products typed "food", the rest are "non-food"
+    #   duplicate_rate: share of fact rows repeated as exact copies
+    #   inventory_ratio: inventory rows per sales row
+    rng = np.random.default_rng(seed)
+    n_products = max(1, round(fact_rows / (n_days * density)))
+
+    # d_date: consecutive days, busier on holidays
+    dates = pd.date_range(start, periods=n_days)
+    fixed = pd.Series(list(zip(dates.month, dates.day))).isin(FIXED_HOLIDAYS).to_numpy()
+    is_holiday = fixed | (rng.random(n_days) < holiday_rate)
+    d_date = pd.DataFrame({"date_id": np.arange(1, n_days + 1), "date": dates, "is_holiday": is_holiday})
+
+    # d_products: retail price a markup on cost
+    unit_cost = np.maximum(rng.lognormal(1.0, 0.6, n_products), 0.1).round(2)
+    d_products = pd.DataFrame({
+        "product_id": np.arange(1, n_products + 1),
+        "product_name": [f"product_{i:07d}" for i in range(1, n_products + 1)],
+        "type": np.where(rng.random(n_products) < food_share, "food", "non-food"),
+        "unit_cost_usd": unit_cost,
+        "unit_retail_price_usd": (unit_cost * rng.uniform(1.2, 3.0, n_products)).round(2),
+    })
+
+    # Few products sell most of the volume, and holidays sell more
+    popularity = 1 / np.arange(1, n_products + 1) ** 0.8
+    popularity = rng.permutation(popularity / popularity.sum())
+    busyness = np.where(is_holiday, 2.5, 1.0)
+    busyness = busyness / busyness.sum()
+
+    def facts(name, rows, mean_quantity):
+        df = pd.DataFrame({
+            "product_id": rng.choice(n_products, rows, p=popularity) + 1,
+            "date_id": rng.choice(n_days, rows, p=busyness) + 1,
+            FACT_QUANTITIES[name]: rng.poisson(mean_quantity, rows) + 1,
+        })
+        copies = df.iloc[rng.choice(rows, round(rows * duplicate_rate), replace=False)]
+        df = pd.concat([df, copies], ignore_index=True)
+        return df.sort_values(["date_id", "product_id"], kind="stable", ignore_index=True).astype(TABLE_DTYPES[name])
+
+    f_sales = facts("f_sales", fact_rows, 3)
+    f_inventory = facts("f_inventory", round(fact_rows * inventory_ratio), 20)
+    return (
+        f_sales,
+        f_inventory,
+        d_products.astype(TABLE_DTYPES["d_products"]),
+        d_date.astype(TABLE_DTYPES["d_date"]),
+    )
+
+def write_tables(tables, data_dir):
+    # One CSV per table, as setup_data writes them
+    os.makedirs(data_dir, exist_ok=True)
+    for name, df in zip(["f_sales", "f_inventory", "d_products", "d_date"], tables):
+        df.to_csv(os.path.join(data_dir, f"{name}.csv"), index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic case study tables as CSV")
+    parser.add_argument("--rows", type=lambda v: int(float(v)), default=1_000_000, help="sales rows, e.g. 1e6")
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--duplicates", type=float, default=0.01, help="share of exact duplicate fact rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="data_synthetic")
+    args = parser.parse_args()
+
+    tables = generate(args.rows, args.days, args.density, duplicate_rate=args.duplicates, seed=args.seed)
+    write_tables(tables, args.out)
+    print(f"✅ {len(tables[0])} sales and {len(tables[1])} inventory rows written to {args.out}/")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config import TABLE_PAGE_ROWS
+
+def paged_table(df, key, column_config=None, page_rows=TABLE_PAGE_ROWS):
+    # st.dataframe for frames of any length. Up to page_rows rows are shown as they are;
+    # longer frames get a filter, sort and page picker that run here over all rows, and
+    # only the rows of the current page are sent to the browser. Keep values raw (numbers,
+    # datetimes) and format them through column_config, which the browser applies to
+    # the visible rows only.
+    if len(df) <= page_rows:
+        st.dataframe(df, column_config=column_config, hide_index=True, use_container_width=True)
+        return
+
+    state = st.session_state
+    col1, col2, col3 = st.columns([2, 2, 1])
+    term = col1.text_input("Filter rows", key=f"{key}_filter", placeholder="Text in any column")
+    sort_col = col2.selectbox("Sort by", [None] + list(df.columns), key=f"{key}_sort", format_func=lambda c: c or "—")
+    descending = col3.toggle("Descending", key=f"{key}_descending")
+
+    rows = df[text_match(df, term)] if term else df
+    if sort_col is not None:
+        rows = rows.sort_values(sort_col, ascending=not descending, kind="stable")
+
+    # A filter can leave fewer pages than the one last shown
+    pages = max(1, -(-len(rows) // page_rows))
+    if state.get(f"{key}_page", 1) > pages:
+        state[f"{key}_page"] = pages
+    page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+
+    start = (page - 1) * page_rows
+    st.dataframe(
+        rows.iloc[start:start + page_rows],
+        column_config=column_config,
+        hide_index=True,
+        use_container_width=True,
+    )
+    if rows.empty:
+        st.caption("No rows match the filter.")
+    else:
+        st.caption(f"Rows {start + 1:,}–{min(start + page_rows, len(rows)):,} of {len(rows):,} (page {page} of {pages})")
+
+def text_match(df, term):
+    # Rows with term in any text column, ignoring case. Categorical columns are searched
+    # through their categories, so each distinct value is checked once.
+    term = term.strip()
+    match = pd.Series(False, index=df.index)
+    for _, column in df.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            hits = column.cat.categories.astype(str).str.contains(term, case=False, regex=False)
+            match |= column.cat.codes.isin(np.flatnonzero(hits))
+        elif pd.api.types.is_string_dtype(column):
+            match |= column.str.contains(term, case=False, regex=False, na=False)
+    return match